@@ -1,16 +1,37 @@
-from fastapi import FastAPI, HTTPException, Request, Depends, UploadFile, File, Form, Response
+from fastapi import FastAPI, HTTPException, Request, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, Text
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from fastapi.responses import HTMLResponse, RedirectResponse, ORJSONResponse, StreamingResponse
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, Text, Index, select, update, func, event, or_
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy import text
+from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
 import httpx
 import random
 import os
-import json
+import orjson
+from functools import lru_cache
+from contextlib import asynccontextmanager
+from typing import NamedTuple
+from urllib.parse import unquote
+from itertools import islice
+import asyncio
+import bisect
+import codecs
+import gzip
 import hashlib
+import hmac
+import io
+import re
 import secrets
+import threading
+import time
 
 # ============ 配置 ============
 NEW_API_URL = os.getenv("NEW_API_URL", "https://velvenode.top")
@@ -27,9 +48,25 @@ APP_TIMEZONE = timezone(timedelta(hours=TIMEZONE_OFFSET_HOURS))
 DATA_DIR = os.getenv("DATA_DIR", "/app/data")
 os.makedirs(DATA_DIR, exist_ok=True)
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DATA_DIR}/coupon.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+# SQLite 页缓存按连接分配，连接池满载时总占用约为 此值 × 连接数
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
 
 BIG_PRIZE_THRESHOLD = float(os.getenv("BIG_PRIZE_THRESHOLD", "50"))
 
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+PUBLIC_CACHE_TTL = int(os.getenv("PUBLIC_CACHE_TTL", "5"))
+LOCAL_COUNTS_TTL = int(os.getenv("LOCAL_COUNTS_TTL", "5"))
+ADMIN_EVENTS_REFRESH = int(os.getenv("ADMIN_EVENTS_REFRESH", "30"))
+ADMIN_EVENTS_MIN_INTERVAL = int(os.getenv("ADMIN_EVENTS_MIN_INTERVAL", "5"))
+ADMIN_STATS_CACHE_TTL = float(os.getenv("ADMIN_STATS_CACHE_TTL", "2"))
+AUTH_CACHE_MAX_SIZE = 10000
+COOLDOWN_CACHE_MAX_SIZE = 100000
+COUPON_INSERT_BATCH = 1000
+
 DEFAULT_COOLDOWN_MINUTES = 480
 DEFAULT_CLAIM_TIMES = 1
 DEFAULT_QUOTA_WEIGHTS = {"1": 50, "5": 30, "10": 15, "50": 4, "100": 1}
@@ -38,6 +75,10 @@ DEFAULT_CLAIM_MODE = "B"
 DEFAULT_QUOTA_RATE = 500000
 
 # ============ 数据库 ============
+def now_utc():
+    """当前 UTC 时间，去掉时区信息，与数据库中存储和读出的格式一致，可直接比较"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 Base = declarative_base()
 
 class CouponPool(Base):
@@ -49,26 +90,35 @@ class CouponPool(Base):
     claimed_by_user_id = Column(Integer, nullable=True)
     claimed_by_username = Column(String(255), nullable=True)
     claimed_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=now_utc)
     source = Column(String(32), default="manual")
+    __table_args__ = (
+        Index("ix_pool_claimed_quota", "is_claimed", "quota_dollars"),
+    )
 
 class ClaimRecord(Base):
     __tablename__ = "claim_records"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, index=True, nullable=False)
+    # 按用户的查询都走以 (user_id, claim_time) 开头的复合索引，不再单独给 user_id 建索引
+    user_id = Column(Integer, nullable=False)
     username = Column(String(255), nullable=False)
     coupon_code = Column(String(64), nullable=False)
     quota_dollars = Column(Float, default=1.0)
-    claim_time = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    claim_time = Column(DateTime, default=now_utc)
     cooldown_expires_at = Column(DateTime, nullable=True)
     auto_redeemed = Column(Boolean, default=False)
+    __table_args__ = (
+        # 带上 cooldown_expires_at，冷却判断只读索引即可完成，不必回表
+        Index("ix_claim_user_time_cd", "user_id", claim_time.desc(), "cooldown_expires_at"),
+        Index("ix_claim_time", claim_time.desc()),
+    )
 
 class SystemConfig(Base):
     __tablename__ = "system_config"
     id = Column(Integer, primary_key=True, autoincrement=True)
     config_key = Column(String(64), unique=True, nullable=False)
     config_value = Column(Text, nullable=False)
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=now_utc)
 
 class UserSession(Base):
     """用户会话表 - 用于存储已验证的用户"""
@@ -78,10 +128,45 @@ class UserSession(Base):
     user_id = Column(Integer, nullable=False)
     username = Column(String(255), nullable=False)
     main_site_session = Column(String(512), nullable=True)  # 存储主站 session 用于充值
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=now_utc)
     expires_at = Column(DateTime, nullable=False)
+    __table_args__ = (
+        Index("ix_session_user", "user_id"),
+    )
+
+# 同步接口运行在 FastAPI 线程池里（默认 40 个线程），默认的 5+10 连接池在突发流量下
+# 会出现 "QueuePool limit reached"，这里显式放大并开启 pre_ping/recycle
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    poolclass=QueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True
+)
+
+if "sqlite" in DATABASE_URL:
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_conn, _):
+        # WAL 让读请求不被领取时的写事务阻塞；busy_timeout 让并发写入排队等待而不是直接报 locked
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+        # 由下面的 begin 事件自己发 BEGIN，才能按需选择 IMMEDIATE
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_sqlite_transaction(conn):
+        # 写事务一开始就拿写锁，等锁交给 busy_timeout 排队；读事务仍是普通 BEGIN，不阻塞其他读
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.get_execution_options().get("sqlite_write") else "BEGIN")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.create_all(bind=engine)
 
@@ -101,6 +186,13 @@ def auto_migrate():
             if 'source' not in columns2:
                 conn.execute(text("ALTER TABLE coupon_pool ADD COLUMN source VARCHAR(32) DEFAULT 'manual'"))
                 conn.commit()
+            # 旧库的表已存在时 create_all 不会补建索引；单列 user_id 索引已被复合索引覆盖，删掉省去写入维护
+            conn.execute(text("DROP INDEX IF EXISTS ix_claim_records_user_id"))
+            conn.execute(text("DROP INDEX IF EXISTS ix_claim_user_time"))
+            for table in (CouponPool.__table__, ClaimRecord.__table__, UserSession.__table__):
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+            conn.commit()
         except Exception as e:
             print(f"迁移检查: {e}")
 
@@ -113,8 +205,18 @@ def get_db():
     finally:
         db.close()
 
-def now_utc():
-    return datetime.now(timezone.utc)
+def begin_write(db: Session):
+    """在 SQLite 上把接下来的操作放进 BEGIN IMMEDIATE 写事务"""
+    # 普通事务先读后写要中途升级写锁，期间若有其他连接提交过会直接报 database is locked，不经过 busy_timeout
+    # 前一阶段留下的只读事务先提交掉；已经是写事务时不做任何事
+    if "sqlite" not in DATABASE_URL:
+        return
+    # 写事务持有写锁，必须在同一次线程池调用里提交，不能跨 await 留到下一步
+    if db.in_transaction():
+        if db.connection().get_execution_options().get("sqlite_write"):
+            return
+        db.commit()
+    db.connection(execution_options={"sqlite_write": True})
 
 def ensure_utc(dt):
     if dt is None:
@@ -130,19 +232,112 @@ def format_local_time(dt):
     dt_local = dt_utc.astimezone(APP_TIMEZONE)
     return dt_local.strftime("%Y-%m-%d %H:%M:%S")
 
+def recent_claim_row(user_id: int, username: str, quota: float, coupon_code: str, claim_time, auto_redeemed: bool) -> dict:
+    """管理后台“最近领取”列表中的一行"""
+    return {
+        "user_id": user_id,
+        "username": username,
+        "quota": quota,
+        "code": coupon_code[:8] + "...",
+        "time": format_local_time(claim_time),
+        "auto_redeemed": bool(auto_redeemed)
+    }
+
+def recent_claim_columns(records) -> dict:
+    """整份统计里的“最近领取”按列输出，每行不用重复字段名，体积和前端解析量都更小"""
+    return {
+        "user_ids": [r.user_id for r in records],
+        "usernames": [r.username for r in records],
+        "quotas": [r.quota_dollars for r in records],
+        "times": [format_local_time(r.claim_time) for r in records],
+        "auto_redeemed": [bool(r.auto_redeemed) for r in records]
+    }
+
+# ============ 公开数据缓存 ============
+# 首页、领取页和公开统计对所有访客相同，短时间缓存渲染结果，避免每次访问都查库
+_public_cache: dict[str, tuple[float, object]] = {}
+
+_public_cache_locks: dict[str, threading.Lock] = {}
+# 保护数据版本号和缓存写入：失效与“检查版本后写入”不能交错
+_public_cache_version_lock = threading.Lock()
+
+def get_public_cached(key: str, builder):
+    cached = _public_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    # 领取后缓存被清空，随后同时到达的请求只让一个线程重新生成，其余线程等它完成后直接取结果
+    with _public_cache_locks.setdefault(key, threading.Lock()):
+        now = time.monotonic()
+        cached = _public_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+        version = _change_version
+        value = builder()
+        # 生成期间数据又变了就不写入，免得把旧结果缓存一个周期
+        with _public_cache_version_lock:
+            if version == _change_version:
+                _public_cache[key] = (now + PUBLIC_CACHE_TTL, value)
+        return value
+
+_change_version = 0
+
+def invalidate_public_cache():
+    """库存或配置变化后调用，让下一次访问重新生成，并通知管理后台的推送连接"""
+    global _change_version
+    # 事件循环和线程池都会调用，自增不是原子操作
+    with _public_cache_version_lock:
+        _public_cache.clear()
+        _change_version += 1
+
+# 每个管理后台推送连接一个队列，领取成功时直接推送这一条记录，不必重新生成整份统计
+_admin_event_queues: set[asyncio.Queue] = set()
+
+def publish_admin_event(event: str, data: dict):
+    """在事件循环中调用；队列满说明连接消费不过来，丢弃即可，之后的全量推送会补齐"""
+    payload = b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+    for queue in _admin_event_queues:
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            pass
+
+# 处于冷却中的用户 -> 冷却结束时间；冷却期内重复查询状态不再查库
+_cooldown_until: dict[int, datetime] = {}
+
+def remember_cooldown(user_id: int, until: datetime, now: datetime):
+    if len(_cooldown_until) >= COOLDOWN_CACHE_MAX_SIZE:
+        # 其他线程可能同时写入或删除：先复制一份再遍历，删除用 pop
+        for uid, expiry in list(_cooldown_until.items()):
+            if expiry <= now:
+                _cooldown_until.pop(uid, None)
+    _cooldown_until[user_id] = until
+
+def load_config_snapshot(db: Session) -> dict:
+    """一次查询读出全部配置并挂在会话上，同一请求内的 get_config 不再逐项查库"""
+    snapshot = db.info.get("config")
+    if snapshot is None:
+        snapshot = dict(db.query(SystemConfig.config_key, SystemConfig.config_value).all())
+        db.info["config"] = snapshot
+    return snapshot
+
 def get_config(db: Session, key: str, default=None):
-    config = db.query(SystemConfig).filter(SystemConfig.config_key == key).first()
-    return config.config_value if config else default
+    return load_config_snapshot(db).get(key, default)
 
 def set_config(db: Session, key: str, value: str):
-    config = db.query(SystemConfig).filter(SystemConfig.config_key == key).first()
-    if config:
-        config.config_value = value
-        config.updated_at = now_utc()
-    else:
-        config = SystemConfig(config_key=key, config_value=value)
-        db.add(config)
+    begin_write(db)
+    result = db.execute(
+        update(SystemConfig)
+        .where(SystemConfig.config_key == key)
+        .values(config_value=value, updated_at=now_utc())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(SystemConfig(config_key=key, config_value=value))
     db.commit()
+    load_config_snapshot(db)[key] = value
+    if key in ("cooldown_minutes", "claim_times"):
+        _cooldown_until.clear()
+    invalidate_public_cache()
 
 def get_cooldown_minutes(db): 
     val = get_config(db, "cooldown_minutes")
@@ -154,14 +349,26 @@ def get_claim_times(db):
 
 def get_quota_weights(db):
     val = get_config(db, "quota_weights")
-    return json.loads(val) if val else DEFAULT_QUOTA_WEIGHTS.copy()
+    return orjson.loads(val) if val else DEFAULT_QUOTA_WEIGHTS.copy()
+
+@lru_cache(maxsize=16)
+def parse_weight_table(raw: str) -> tuple:
+    """把权重配置解析成 (额度, 权重) 元组，同一份配置只解析一次"""
+    return tuple((float(q_str), float(weight)) for q_str, weight in orjson.loads(raw).items())
+
+DEFAULT_WEIGHT_TABLE = parse_weight_table(orjson.dumps(DEFAULT_QUOTA_WEIGHTS).decode())
+
+def get_weight_table(db) -> tuple:
+    val = get_config(db, "quota_weights")
+    return parse_weight_table(val) if val else DEFAULT_WEIGHT_TABLE
 
 def get_quota_stock(db):
     val = get_config(db, "quota_stock")
-    return json.loads(val) if val else DEFAULT_QUOTA_STOCK.copy()
+    return orjson.loads(val) if val else DEFAULT_QUOTA_STOCK.copy()
 
 def set_quota_stock(db, stock: dict):
-    set_config(db, "quota_stock", json.dumps(stock))
+    # 每次领取都会读写库存配置，用 orjson 解析和序列化
+    set_config(db, "quota_stock", orjson.dumps(stock).decode())
 
 def get_claim_mode(db):
     val = get_config(db, "claim_mode")
@@ -181,9 +388,9 @@ def init_default_config(db: Session):
     if not get_config(db, "claim_times"):
         set_config(db, "claim_times", str(DEFAULT_CLAIM_TIMES))
     if not get_config(db, "quota_weights"):
-        set_config(db, "quota_weights", json.dumps(DEFAULT_QUOTA_WEIGHTS))
+        set_config(db, "quota_weights", orjson.dumps(DEFAULT_QUOTA_WEIGHTS).decode())
     if not get_config(db, "quota_stock"):
-        set_config(db, "quota_stock", json.dumps(DEFAULT_QUOTA_STOCK))
+        set_config(db, "quota_stock", orjson.dumps(DEFAULT_QUOTA_STOCK).decode())
     if not get_config(db, "claim_mode"):
         set_config(db, "claim_mode", DEFAULT_CLAIM_MODE)
     if not get_config(db, "quota_rate"):
@@ -194,14 +401,71 @@ def init_default_config(db: Session):
 with SessionLocal() as db:
     init_default_config(db)
 
-app = FastAPI(title="兑换券系统")
+app = FastAPI(title="兑换券系统", default_response_class=ORJSONResponse)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# 复用同一个客户端访问主站，保持 keep-alive 连接，避免每次请求都重新握手；
+# 安装了 h2 时启用 HTTP/2，多个请求复用同一条连接
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+http_client = httpx.AsyncClient(
+    base_url=NEW_API_URL,
+    http2=HTTP2_AVAILABLE,
+    timeout=15.0,
+    # httpx 默认空闲 5 秒就关闭连接，流量稀疏时几乎每次都要重新握手；30 秒仍低于常见服务端的空闲超时
+    limits=httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=30.0)
+)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
 
 # ============ 会话管理 ============
+class SessionInfo(NamedTuple):
+    user_id: int
+    username: str
+    expires_at: datetime
+
+# 本站会话 token -> (缓存过期时间, 会话信息)；每次请求都带 cookie，命中时不查库
+_session_cache: dict[str, tuple[float, SessionInfo]] = {}
+
+def ttl_cache_put(cache: dict, key, value):
+    """写入 (过期时间, 值) 缓存，超出上限或已过期的条目从最旧的一端淘汰"""
+    # TTL 固定，重新写入前先移除旧键，字典的插入顺序就是过期顺序，不必扫描全表
+    now = time.monotonic()
+    cache.pop(key, None)
+    while cache:
+        # 其他线程可能同时增删，取最旧的键失败就重试，删除用 pop
+        try:
+            oldest = next(iter(cache))
+        except (RuntimeError, StopIteration):
+            continue
+        entry = cache.get(oldest)
+        if entry and entry[0] > now and len(cache) < AUTH_CACHE_MAX_SIZE:
+            break
+        cache.pop(oldest, None)
+    cache[key] = (now + AUTH_CACHE_TTL, value)
+
+def cache_session(token: str, info: SessionInfo):
+    ttl_cache_put(_session_cache, token, info)
+
+def get_cached_session(token: str) -> SessionInfo | None:
+    cached = _session_cache.get(token) if token else None
+    if cached and cached[0] > time.monotonic() and cached[1].expires_at > now_utc():
+        return cached[1]
+    return None
+
 def create_session(db: Session, user_id: int, username: str, main_session: str = None) -> str:
     """创建本站会话"""
     # 清理该用户的旧会话
     db.query(UserSession).filter(UserSession.user_id == user_id).delete()
+    for k in [k for k, v in list(_session_cache.items()) if v[1].user_id == user_id]:
+        _session_cache.pop(k, None)
     
     token = secrets.token_hex(32)
     expires = now_utc() + timedelta(days=7)
@@ -215,29 +479,65 @@ def create_session(db: Session, user_id: int, username: str, main_session: str =
     )
     db.add(session)
     db.commit()
+    cache_session(token, SessionInfo(user_id, username, expires))
     return token
 
-def get_session(db: Session, token: str) -> UserSession | None:
+def get_session(db: Session, token: str) -> SessionInfo | None:
     """获取有效会话"""
     if not token:
         return None
-    session = db.query(UserSession).filter(
+    info = get_cached_session(token)
+    if info:
+        return info
+    row = db.query(UserSession.user_id, UserSession.username, UserSession.expires_at).filter(
         UserSession.session_token == token,
         UserSession.expires_at > now_utc()
     ).first()
-    return session
+    if not row:
+        return None
+    info = SessionInfo(row.user_id, row.username, row.expires_at)
+    cache_session(token, info)
+    return info
+
+def create_and_get_session(db: Session, user_id: int, username: str, main_session: str) -> SessionInfo | None:
+    """用主站身份新建会话并返回会话信息"""
+    return get_session(db, create_session(db, user_id, username, main_session))
 
 def delete_session(db: Session, token: str):
     """删除会话"""
+    _session_cache.pop(token, None)
     db.query(UserSession).filter(UserSession.session_token == token).delete()
     db.commit()
 
 # ============ 用户验证 ============
+# 主站 session 验证结果缓存: cookie 摘要 -> (过期时间, 用户信息)，只缓存成功结果
+_auth_cache: dict[bytes, tuple[float, dict]] = {}
+_auth_inflight: dict[bytes, asyncio.Future] = {}
+
 async def verify_user_by_main_session(session_cookie: str) -> dict | None:
-    """通过主站的 session cookie 验证用户"""
+    """通过主站的 session cookie 验证用户，短时间内重复验证直接命中缓存"""
     if not session_cookie:
         return None
     
+    key = hashlib.blake2b(session_cookie.encode(), digest_size=16).digest()
+    now = time.monotonic()
+    cached = _auth_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    
+    # 同一个 cookie 的并发验证（页面同时发出的多个请求）合并为一次主站查询
+    task = _auth_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch_user_by_main_session(session_cookie))
+        _auth_inflight[key] = task
+        task.add_done_callback(lambda _: _auth_inflight.pop(key, None))
+    user_info = await asyncio.shield(task)
+    if user_info:
+        ttl_cache_put(_auth_cache, key, user_info)
+    return user_info
+
+async def fetch_user_by_main_session(session_cookie: str) -> dict | None:
+    """解析主站 session cookie 并向主站查询用户信息"""
     try:
         import base64
         
@@ -303,24 +603,24 @@ async def verify_user_by_main_session(session_cookie: str) -> dict | None:
             return None
         
         # 用管理员令牌获取用户信息
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{NEW_API_URL}/api/user/{user_id}",
-                headers={
-                    "Authorization": f"Bearer {ADMIN_ACCESS_TOKEN}",
-                    "New-Api-User": str(ADMIN_USER_ID)
+        response = await http_client.get(
+            f"/api/user/{user_id}",
+            headers={
+                "Authorization": f"Bearer {ADMIN_ACCESS_TOKEN}",
+                "New-Api-User": str(ADMIN_USER_ID)
+            },
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("success"):
+                user_data = data.get("data", {})
+                return {
+                    "user_id": user_data.get("id"),
+                    "username": user_data.get("username"),
+                    "display_name": user_data.get("display_name", user_data.get("username"))
                 }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success"):
-                    user_data = data.get("data", {})
-                    return {
-                        "user_id": user_data.get("id"),
-                        "username": user_data.get("username"),
-                        "display_name": user_data.get("display_name", user_data.get("username"))
-                    }
         
         return None
         
@@ -336,30 +636,29 @@ async def create_redemption_code_via_api(quota_dollars: float, db: Session) -> s
     quota_rate = get_quota_rate(db)
     quota = int(quota_dollars * quota_rate)
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
-                f"{NEW_API_URL}/api/redemption/",
-                headers={
-                    "Authorization": f"Bearer {ADMIN_ACCESS_TOKEN}",
-                    "New-Api-User": ADMIN_USER_ID,
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "name": f"抽奖${quota_dollars}",
-                    "count": 1,
-                    "quota": quota,
-                    "expired_time": 0
-                }
-            )
-            if response.status_code != 200:
-                print(f"创建兑换码失败: HTTP {response.status_code} - {response.text}")
-                return None
-            data = response.json()
-            if not data.get("success"):
-                print(f"创建兑换码失败: {data}")
-                return None
-            codes = data.get("data", [])
-            return codes[0] if codes else None
+        response = await http_client.post(
+            "/api/redemption/",
+            headers={
+                "Authorization": f"Bearer {ADMIN_ACCESS_TOKEN}",
+                "New-Api-User": ADMIN_USER_ID,
+                "Content-Type": "application/json"
+            },
+            json={
+                "name": f"抽奖${quota_dollars}",
+                "count": 1,
+                "quota": quota,
+                "expired_time": 0
+            }
+        )
+        if response.status_code != 200:
+            print(f"创建兑换码失败: HTTP {response.status_code} - {response.text}")
+            return None
+        data = response.json()
+        if not data.get("success"):
+            print(f"创建兑换码失败: {data}")
+            return None
+        codes = data.get("data", [])
+        return codes[0] if codes else None
     except Exception as e:
         print(f"创建兑换码异常: {e}")
         return None
@@ -370,25 +669,24 @@ async def topup_user_by_admin(user_id: int, quota: int, remark: str = "抽奖充
         print(f"[TOPUP] 参数缺失")
         return False
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
-                f"{NEW_API_URL}/api/user/topup/complete",
-                headers={
-                    "Authorization": f"Bearer {ADMIN_ACCESS_TOKEN}",
-                    "New-Api-User": str(ADMIN_USER_ID),
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "user_id": user_id,
-                    "quota": quota,
-                    "remark": remark
-                }
-            )
-            print(f"[TOPUP] user_id={user_id}, quota={quota}, 响应: {response.status_code} - {response.text[:300]}")
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("success", False)
-            return False
+        response = await http_client.post(
+            "/api/user/topup/complete",
+            headers={
+                "Authorization": f"Bearer {ADMIN_ACCESS_TOKEN}",
+                "New-Api-User": str(ADMIN_USER_ID),
+                "Content-Type": "application/json"
+            },
+            json={
+                "user_id": user_id,
+                "quota": quota,
+                "remark": remark
+            }
+        )
+        print(f"[TOPUP] user_id={user_id}, quota={quota}, 响应: {response.status_code} - {response.text[:300]}")
+        if response.status_code == 200:
+            result = response.json()
+            return result.get("success", False)
+        return False
     except Exception as e:
         print(f"[TOPUP] 异常: {e}")
         return False
@@ -403,12 +701,51 @@ def get_stock_key(quota_stock: dict, quota: float) -> str:
             return int_str
     return q_str
 
+# 本地未领取兑换码的分档计数，进程内维护：领取/上传时增减，删除时重置，
+# 并定期从数据库重新统计，以收敛多进程部署下其他 worker 的变化
+_local_counts: dict | None = None
+_local_counts_expires = 0.0
+_local_counts_lock = threading.Lock()
+
+def get_local_quota_counts(db: Session) -> dict:
+    """本地未领取兑换码按额度分组计数，命中进程内计数时不查库"""
+    counts = _local_counts
+    if counts is not None and _local_counts_expires > time.monotonic():
+        return counts
+    rows = db.query(CouponPool.quota_dollars, func.count(CouponPool.id)).filter(
+        CouponPool.is_claimed == False
+    ).group_by(CouponPool.quota_dollars).all()
+    counts = {quota: count for quota, count in rows}
+    store_local_quota_counts(counts)
+    return counts
+
+def store_local_quota_counts(counts: dict):
+    """用刚查出的完整计数刷新进程内缓存"""
+    global _local_counts, _local_counts_expires
+    with _local_counts_lock:
+        _local_counts = counts
+        _local_counts_expires = time.monotonic() + LOCAL_COUNTS_TTL
+
+def adjust_local_quota_count(quota: float, delta: int):
+    """按增量更新进程内计数；替换整个字典，读者手里的旧字典不受影响"""
+    global _local_counts
+    with _local_counts_lock:
+        if _local_counts is not None:
+            counts = dict(_local_counts)
+            counts[quota] = max(0, counts.get(quota, 0) + delta)
+            _local_counts = counts
+
+def reset_local_quota_counts():
+    global _local_counts
+    with _local_counts_lock:
+        _local_counts = None
+
 def get_total_available_stock(db: Session) -> int:
     claim_mode = get_claim_mode(db)
     quota_stock = get_quota_stock(db)
     
     if claim_mode == "A":
-        local_count = db.query(CouponPool).filter(CouponPool.is_claimed == False).count()
+        local_count = sum(get_local_quota_counts(db).values())
         virtual_total = sum(max(0, int(v)) for v in quota_stock.values())
         return max(local_count, virtual_total)
     else:
@@ -416,46 +753,38 @@ def get_total_available_stock(db: Session) -> int:
 
 def draw_random_quota(db: Session) -> float | None:
     claim_mode = get_claim_mode(db)
-    probability_mode = get_probability_mode(db)
+    weight_only = get_probability_mode(db) == "weight_only"
     quota_stock = get_quota_stock(db)
-    quota_weights = get_quota_weights(db)
+    local_counts = get_local_quota_counts(db) if claim_mode == "A" else {}
     
-    available = []
+    # 边遍历边累加权重，抽取时对累计权重二分查找，不再让 random.choices 每次重建累计表
+    quotas = []
+    cum_weights = []
+    total = 0.0
     
-    for q_str, weight in quota_weights.items():
-        quota = float(q_str)
+    for quota, weight in get_weight_table(db):
         stock_key = get_stock_key(quota_stock, quota)
         virtual_stock = int(quota_stock.get(stock_key, 0))
         
         if claim_mode == "A":
-            local_count = db.query(CouponPool).filter(
-                CouponPool.is_claimed == False,
-                CouponPool.quota_dollars == quota
-            ).count()
-            effective_stock = max(local_count, virtual_stock)
+            effective_stock = max(local_counts.get(quota, 0), virtual_stock)
         else:
             effective_stock = virtual_stock
         
         if effective_stock > 0:
-            if probability_mode == "weight_only":
-                actual_weight = float(weight)
-            else:
-                actual_weight = float(weight) * effective_stock
-            
-            available.append({
-                "quota": quota,
-                "actual_weight": actual_weight
-            })
+            total += weight if weight_only else weight * effective_stock
+            quotas.append(quota)
+            cum_weights.append(total)
     
-    if not available:
+    if not quotas or total <= 0:
         return None
     
-    quotas = [item["quota"] for item in available]
-    weights = [item["actual_weight"] for item in available]
-    
-    return random.choices(quotas, weights=weights, k=1)[0]
+    return quotas[min(bisect.bisect(cum_weights, random.random() * total), len(quotas) - 1)]
 
 def deduct_virtual_stock(db: Session, quota: float) -> bool:
+    # 扣减前先拿写锁再重新读取库存，读和写之间不会插进其他 worker 的扣减
+    begin_write(db)
+    db.info.pop("config", None)
     quota_stock = get_quota_stock(db)
     stock_key = get_stock_key(quota_stock, quota)
     
@@ -466,31 +795,75 @@ def deduct_virtual_stock(db: Session, quota: float) -> bool:
         return True
     return False
 
-def get_local_coupon(db: Session, quota: float):
-    return db.query(CouponPool).filter(
+def claim_local_coupon(db: Session, quota: float, user_id: int, username: str, now: datetime) -> str | None:
+    """原子地占用一个本地兑换码，单条 UPDATE ... RETURNING 避免并发重复发放"""
+    # SQLite 的写事务本身串行；PostgreSQL 等数据库用 SKIP LOCKED 让并发领取各自挑到不同的行
+    target_id = select(CouponPool.id).where(
         CouponPool.is_claimed == False,
         CouponPool.quota_dollars == quota
-    ).first()
+    ).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+    coupon_code = db.execute(
+        update(CouponPool)
+        .where(CouponPool.id == target_id, CouponPool.is_claimed == False)
+        .values(
+            is_claimed=True,
+            claimed_by_user_id=user_id,
+            claimed_by_username=username,
+            claimed_at=now
+        )
+        .returning(CouponPool.coupon_code)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if coupon_code:
+        adjust_local_quota_count(quota, -1)
+    else:
+        # 计数显示有货但实际已被领完（例如被其他 worker 领走），下次重新统计
+        reset_local_quota_counts()
+    return coupon_code
+
+def insert_local_coupons(db: Session, codes, quota: float) -> int:
+    """分批写入本地兑换码，已存在的自动跳过，返回实际新增数量"""
+    # codes 可以是逐行读取的文件，每次只取一批，内存占用与文件大小无关
+    stripped = filter(None, (c.strip() for c in codes if c))
+    inserted = 0
+    while batch := list(dict.fromkeys(islice(stripped, COUPON_INSERT_BATCH))):
+        # 每批单独提交：流式上传时写锁只在写这一批时持有，不会在等待后续数据期间挡住领取
+        # 重复的码会被跳过，中途失败后重新上传同一文件即可补齐
+        begin_write(db)
+        added = insert_coupon_batch(db, batch, quota)
+        db.commit()
+        adjust_local_quota_count(quota, added)
+        inserted += added
+    return inserted
+
+def insert_coupon_batch(db: Session, codes: list[str], quota: float) -> int:
+    rows = [{"coupon_code": code, "quota_dollars": quota, "source": "manual"} for code in codes]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert_fn = sqlite_insert if dialect == "sqlite" else pg_insert
+        stmt = insert_fn(CouponPool.__table__).on_conflict_do_nothing(index_elements=["coupon_code"])
+        return db.execute(stmt, rows).rowcount
+    # 其他数据库没有 ON CONFLICT，先一次查出已存在的码再整批插入
+    existing = set(db.scalars(select(CouponPool.coupon_code).where(CouponPool.coupon_code.in_(codes))))
+    rows = [row for row in rows if row["coupon_code"] not in existing]
+    if rows:
+        db.execute(CouponPool.__table__.insert(), rows)
+    return len(rows)
 
 def get_big_prizes(db: Session) -> list:
     quota_stock = get_quota_stock(db)
-    quota_weights = get_quota_weights(db)
     claim_mode = get_claim_mode(db)
+    local_counts = get_local_quota_counts(db) if claim_mode == "A" else {}
     
     big_prizes = []
     
-    for q_str in quota_weights.keys():
-        quota = float(q_str)
+    for quota, _ in get_weight_table(db):
         if quota >= BIG_PRIZE_THRESHOLD:
             stock_key = get_stock_key(quota_stock, quota)
             virtual_stock = int(quota_stock.get(stock_key, 0))
             
             if claim_mode == "A":
-                local_count = db.query(CouponPool).filter(
-                    CouponPool.is_claimed == False,
-                    CouponPool.quota_dollars == quota
-                ).count()
-                total = max(local_count, virtual_stock)
+                total = max(local_counts.get(quota, 0), virtual_stock)
             else:
                 total = virtual_stock
             
@@ -508,38 +881,64 @@ def format_cooldown(minutes: int) -> str:
     return f"{minutes}分钟"
 
 def calculate_user_cooldown_status(db: Session, user_id: int, now: datetime):
+    blocked_until = _cooldown_until.get(user_id)
+    if blocked_until:
+        if now < blocked_until:
+            return False, 0, int((blocked_until - now).total_seconds()), []
+        # 线程池里同一用户的请求可能同时走到这里，用 pop 避免第二个 del 抛 KeyError
+        _cooldown_until.pop(user_id, None)
+    
     cooldown_minutes = get_cooldown_minutes(db)
     claim_times = get_claim_times(db)
-    max_lookback = now - timedelta(minutes=cooldown_minutes * 2)
-    recent_claims = db.query(ClaimRecord).filter(
+    # 仍在冷却中的判定直接下推到 SQL：领取时间在冷却窗口内，且记录的过期时间未到
+    window_start = now - timedelta(minutes=cooldown_minutes)
+    recent_claims = db.query(ClaimRecord.claim_time, ClaimRecord.cooldown_expires_at).filter(
         ClaimRecord.user_id == user_id,
-        ClaimRecord.claim_time >= max_lookback
-    ).order_by(ClaimRecord.claim_time.desc()).all()
-    active_claims = []
-    for claim in recent_claims:
-        claim_time = ensure_utc(claim.claim_time)
-        config_expires = claim_time + timedelta(minutes=cooldown_minutes)
-        stored_expires = ensure_utc(claim.cooldown_expires_at) if claim.cooldown_expires_at else None
-        actual_expires = min(config_expires, stored_expires) if stored_expires else config_expires
-        if now < actual_expires:
-            active_claims.append({'claim': claim, 'expires_at': actual_expires})
-    claims_in_period = len(active_claims)
+        ClaimRecord.claim_time > window_start,
+        or_(ClaimRecord.cooldown_expires_at.is_(None), ClaimRecord.cooldown_expires_at > now)
+    ).all()
+    claims_in_period = len(recent_claims)
     remaining_claims = max(0, claim_times - claims_in_period)
     can_claim = True
     cooldown_seconds = 0
-    if claims_in_period >= claim_times and active_claims:
-        earliest_expiry = min(c['expires_at'] for c in active_claims)
+    if claims_in_period >= claim_times and recent_claims:
+        cooldown = timedelta(minutes=cooldown_minutes)
+        earliest_expiry = min(
+            min(c.claim_time + cooldown, c.cooldown_expires_at) if c.cooldown_expires_at else c.claim_time + cooldown
+            for c in recent_claims
+        )
         if now < earliest_expiry:
             can_claim = False
             cooldown_seconds = int((earliest_expiry - now).total_seconds())
+            remember_cooldown(user_id, earliest_expiry, now)
     return can_claim, remaining_claims, cooldown_seconds, recent_claims
 
+# 用户 -> (锁, 持有和等待该锁的请求数)；只在事件循环中访问
+_user_claim_locks: dict[int, tuple[asyncio.Lock, int]] = {}
+
+@asynccontextmanager
+async def user_claim_lock(user_id: int):
+    """同一用户的领取在本进程内排队，最后一个持有或等待的请求结束后才删除该用户的锁"""
+    # 不能按 locked() 清理：锁释放后、排队的请求重新拿到锁之前 locked() 也是 False
+    lock, refs = _user_claim_locks.get(user_id) or (asyncio.Lock(), 0)
+    _user_claim_locks[user_id] = (lock, refs + 1)
+    try:
+        async with lock:
+            yield
+    finally:
+        lock, refs = _user_claim_locks[user_id]
+        if refs > 1:
+            _user_claim_locks[user_id] = (lock, refs - 1)
+        else:
+            del _user_claim_locks[user_id]
+
 # ============ 认证 API ============
+# 只访问数据库的接口声明为普通 def，由 FastAPI 放到线程池执行，
+# 避免同步的 SQLAlchemy 调用阻塞事件循环；需要 await 远程接口的保持 async，
+# 其中的数据库操作通过 run_in_threadpool 放到线程池
 @app.get("/api/auth/check")
 async def check_auth(request: Request, db: Session = Depends(get_db)):
     """检查用户登录状态"""
-    from fastapi.responses import JSONResponse
-    
     main_session = request.cookies.get("session")
     local_token = request.cookies.get("coupon_session")
     
@@ -549,7 +948,9 @@ async def check_auth(request: Request, db: Session = Depends(get_db)):
         main_user = await verify_user_by_main_session(main_session)
     
     # 检查本站 session
-    local_session = get_session(db, local_token) if local_token else None
+    local_session = get_cached_session(local_token)
+    if not local_session and local_token:
+        local_session = await run_in_threadpool(get_session, db, local_token)
     
     # 如果主站已登录
     if main_user:
@@ -557,10 +958,10 @@ async def check_auth(request: Request, db: Session = Depends(get_db)):
         if not local_session or local_session.user_id != main_user["user_id"]:
             # 删除旧 session
             if local_token:
-                delete_session(db, local_token)
+                await run_in_threadpool(delete_session, db, local_token)
             # 创建新 session
-            token = create_session(db, main_user["user_id"], main_user["username"], main_session)
-            response = JSONResponse(content={
+            token = await run_in_threadpool(create_session, db, main_user["user_id"], main_user["username"], main_session)
+            response = ORJSONResponse(content={
                 "success": True,
                 "logged_in": True,
                 "data": main_user
@@ -617,7 +1018,7 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
     if main_session:
         user_info = await verify_user_by_main_session(main_session)
         if user_info:
-            token = create_session(db, user_info["user_id"], user_info["username"], main_session)
+            token = await run_in_threadpool(create_session, db, user_info["user_id"], user_info["username"], main_session)
             response = RedirectResponse(url="/claim", status_code=302)
             response.set_cookie(
                 key="coupon_session",
@@ -632,7 +1033,7 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
     return RedirectResponse(url="/claim?error=auth_failed", status_code=302)
 
 @app.post("/api/auth/logout")
-async def auth_logout(request: Request, db: Session = Depends(get_db)):
+def auth_logout(request: Request, db: Session = Depends(get_db)):
     """登出"""
     token = request.cookies.get("coupon_session")
     if token:
@@ -642,27 +1043,32 @@ async def auth_logout(request: Request, db: Session = Depends(get_db)):
     return response
 
 # ============ 领取 API ============
-@app.get("/api/claim/status")
-async def get_claim_status(request: Request, db: Session = Depends(get_db)):
-    """获取领取状态"""
-    # 检查本站会话
+async def require_user_session(request: Request, db: Session = Depends(get_db)) -> SessionInfo:
+    """领取相关接口共用的登录校验：先查本站会话，没有再用主站 session 建立"""
     local_token = request.cookies.get("coupon_session")
-    session = get_session(db, local_token) if local_token else None
+    session = get_cached_session(local_token)
+    if not session and local_token:
+        session = await run_in_threadpool(get_session, db, local_token)
     
-    # 也尝试主站 session
     if not session:
         main_session = request.cookies.get("session")
         if main_session:
             user_info = await verify_user_by_main_session(main_session)
             if user_info:
-                token = create_session(db, user_info["user_id"], user_info["username"], main_session)
-                session = get_session(db, token)
+                session = await run_in_threadpool(
+                    create_and_get_session, db, user_info["user_id"], user_info["username"], main_session
+                )
     
     if not session:
         raise HTTPException(status_code=401, detail="请先登录")
-    
-    user_id = session.user_id
-    username = session.username
+    return session
+
+@app.get("/api/claim/status")
+async def get_claim_status(session: SessionInfo = Depends(require_user_session), db: Session = Depends(get_db)):
+    """获取领取状态"""
+    return await run_in_threadpool(build_claim_status, db, session.user_id, session.username)
+
+def build_claim_status(db: Session, user_id: int, username: str) -> dict:
     claim_times = get_claim_times(db)
     claim_mode = get_claim_mode(db)
     now = now_utc()
@@ -682,7 +1088,9 @@ async def get_claim_status(request: Request, db: Session = Depends(get_db)):
     
     big_prizes = get_big_prizes(db)
     
-    history = db.query(ClaimRecord).filter(ClaimRecord.user_id == user_id).order_by(ClaimRecord.claim_time.desc()).limit(10).all()
+    history = db.query(
+        ClaimRecord.coupon_code, ClaimRecord.quota_dollars, ClaimRecord.claim_time, ClaimRecord.auto_redeemed
+    ).filter(ClaimRecord.user_id == user_id).order_by(ClaimRecord.claim_time.desc()).limit(10).all()
     
     return {
         "success": True,
@@ -700,35 +1108,23 @@ async def get_claim_status(request: Request, db: Session = Depends(get_db)):
                 {
                     "coupon_code": r.coupon_code,
                     "quota": r.quota_dollars,
-                    "claim_time": r.claim_time.isoformat() if r.claim_time else "",
-                    "auto_redeemed": getattr(r, 'auto_redeemed', False)
+                    "claim_time": r.claim_time or "",
+                    "auto_redeemed": bool(r.auto_redeemed)
                 } for r in history
             ]
         }
     }
 
 @app.post("/api/claim")
-async def claim_coupon(request: Request, db: Session = Depends(get_db)):
+async def claim_coupon(session: SessionInfo = Depends(require_user_session), db: Session = Depends(get_db)):
     """领取兑换券"""
-    local_token = request.cookies.get("coupon_session")
-    session = get_session(db, local_token) if local_token else None
-    
-    if not session:
-        main_session = request.cookies.get("session")
-        if main_session:
-            user_info = await verify_user_by_main_session(main_session)
-            if user_info:
-                token = create_session(db, user_info["user_id"], user_info["username"], main_session)
-                session = get_session(db, token)
-    
-    if not session:
-        raise HTTPException(status_code=401, detail="请先登录")
-    
-    user_id = session.user_id
-    username = session.username
-    cooldown_minutes = get_cooldown_minutes(db)
-    now = now_utc()
-    
+    # 同一用户的并发领取在本进程内排队，避免两个请求都通过冷却判断
+    async with user_claim_lock(session.user_id):
+        return await claim_for_user(db, session.user_id, session.username)
+
+def prepare_claim(db: Session, user_id: int, now: datetime):
+    """检查冷却和库存并抽取额度，返回 (剩余次数, 领取模式, 额度)"""
+    # 先做冷却判断：冷却中的用户直接命中进程内缓存返回，不再读取配置和库存
     can_claim, remaining_claims, cooldown_seconds, _ = calculate_user_cooldown_status(db, user_id, now)
     
     if not can_claim:
@@ -746,33 +1142,73 @@ async def claim_coupon(request: Request, db: Session = Depends(get_db)):
     quota = draw_random_quota(db)
     if quota is None:
         raise HTTPException(status_code=400, detail="没有可用的兑换码")
+    return remaining_claims, claim_mode, quota
+
+def claim_local_or_release(db: Session, quota: float, user_id: int, username: str, now: datetime) -> str | None:
+    """占用本地兑换码并写入领取记录；未命中时释放写锁返回 None"""
+    begin_write(db)
+    coupon_code = claim_local_coupon(db, quota, user_id, username, now)
+    if not coupon_code:
+        # 未命中本地库存，先结束事务释放写锁，再调用远程接口
+        db.rollback()
+        return None
+    # 占用和领取记录在同一次线程池调用里提交，写锁不会跨 await 持有
+    save_claim_record(db, user_id, username, coupon_code, quota, now, False)
+    return coupon_code
+
+def save_api_coupon(db: Session, coupon_code: str, quota: float, user_id: int, username: str, now: datetime):
+    """扣减虚拟库存，保存远程创建的兑换码并写入领取记录"""
+    deduct_virtual_stock(db, quota)
+    begin_write(db)
+    db.execute(CouponPool.__table__.insert().values(
+        coupon_code=coupon_code,
+        quota_dollars=quota,
+        is_claimed=True,
+        claimed_by_user_id=user_id,
+        claimed_by_username=username,
+        claimed_at=now,
+        source="api"
+    ))
+    save_claim_record(db, user_id, username, coupon_code, quota, now, False)
+
+def save_topup_claim(db: Session, coupon_code: str, quota: float, user_id: int, username: str, now: datetime):
+    """直接充值成功后扣减虚拟库存并写入领取记录"""
+    deduct_virtual_stock(db, quota)
+    save_claim_record(db, user_id, username, coupon_code, quota, now, True)
+
+def save_claim_record(db: Session, user_id: int, username: str, coupon_code: str, quota: float, now: datetime, auto_redeemed: bool):
+    begin_write(db)
+    cooldown_expires = now + timedelta(minutes=get_cooldown_minutes(db))
+    # 领取记录直接用 Core INSERT 写入，不经过 ORM 的 unit of work
+    db.execute(ClaimRecord.__table__.insert().values(
+        user_id=user_id,
+        username=username,
+        coupon_code=coupon_code,
+        quota_dollars=quota,
+        claim_time=now,
+        cooldown_expires_at=cooldown_expires,
+        auto_redeemed=auto_redeemed
+    ))
+    db.commit()
+    # 每个周期只能领一次时，这次领取后冷却结束时间已知，领取后的状态刷新无需再查库
+    if get_claim_times(db) == 1:
+        remember_cooldown(user_id, cooldown_expires, now)
+
+async def claim_for_user(db: Session, user_id: int, username: str):
+    # 数据库操作按阶段放进线程池，事件循环只负责等待远程接口
+    now = now_utc()
+    remaining_claims, claim_mode, quota = await run_in_threadpool(prepare_claim, db, user_id, now)
     
     coupon_code = None
     auto_redeemed = False
     
     if claim_mode == "A":
-        # A模式：优先本地兑换码，否则调用API创建
-        local_coupon = get_local_coupon(db, quota)
-        if local_coupon:
-            coupon_code = local_coupon.coupon_code
-            local_coupon.is_claimed = True
-            local_coupon.claimed_by_user_id = user_id
-            local_coupon.claimed_by_username = username
-            local_coupon.claimed_at = now
-        else:
+        # A模式：优先本地兑换码，否则调用API创建；每条路径的写入都在一次线程池调用内提交
+        coupon_code = await run_in_threadpool(claim_local_or_release, db, quota, user_id, username, now)
+        if not coupon_code:
             coupon_code = await create_redemption_code_via_api(quota, db)
             if coupon_code:
-                deduct_virtual_stock(db, quota)
-                new_coupon = CouponPool(
-                    coupon_code=coupon_code,
-                    quota_dollars=quota,
-                    is_claimed=True,
-                    claimed_by_user_id=user_id,
-                    claimed_by_username=username,
-                    claimed_at=now,
-                    source="api"
-                )
-                db.add(new_coupon)
+                await run_in_threadpool(save_api_coupon, db, coupon_code, quota, user_id, username, now)
     else:
         # B模式：直接给用户充值，不创建兑换码
         quota_rate = get_quota_rate(db)
@@ -780,8 +1216,8 @@ async def claim_coupon(request: Request, db: Session = Depends(get_db)):
         
         if await topup_user_by_admin(user_id, topup_quota, f"抽奖${quota}"):
             auto_redeemed = True
-            deduct_virtual_stock(db, quota)
-            coupon_code = f"DIRECT-{user_id}-{int(now.timestamp())}"
+            coupon_code = f"DIRECT-{user_id}-{int(time.time())}"
+            await run_in_threadpool(save_topup_claim, db, coupon_code, quota, user_id, username, now)
             print(f"[CLAIM] 直接充值成功: user_id={user_id}, quota={topup_quota}")
         else:
             print(f"[CLAIM] 直接充值失败")
@@ -790,18 +1226,10 @@ async def claim_coupon(request: Request, db: Session = Depends(get_db)):
     if not coupon_code:
         raise HTTPException(status_code=500, detail="领取失败，请稍后重试")
     
-    cooldown_expires = now + timedelta(minutes=cooldown_minutes)
-    record = ClaimRecord(
-        user_id=user_id,
-        username=username,
-        coupon_code=coupon_code,
-        quota_dollars=quota,
-        claim_time=now,
-        cooldown_expires_at=cooldown_expires,
-        auto_redeemed=auto_redeemed
-    )
-    db.add(record)
-    db.commit()
+    invalidate_public_cache()
+    publish_admin_event("claim", recent_claim_row(user_id, username, quota, coupon_code, now, auto_redeemed))
+    # 领取后的最新状态随响应一起返回，页面不必再请求一次 /api/claim/status
+    status = await run_in_threadpool(build_claim_status, db, user_id, username)
     
     return {
         "success": True,
@@ -810,54 +1238,116 @@ async def claim_coupon(request: Request, db: Session = Depends(get_db)):
             "quota": quota,
             "remaining_claims": remaining_claims - 1,
             "auto_redeemed": auto_redeemed,
-            "claim_mode": claim_mode
+            "claim_mode": claim_mode,
+            "status": status["data"]
         }
     }
 
+# ============ 管理员请求模型 ============
+class AdminRequest(BaseModel):
+    password: str = ""
+
+class AddCouponsRequest(AdminRequest):
+    coupons: list[str] = []
+    quota: float = 1
+
+class DeleteCouponRequest(AdminRequest):
+    id: int | None = None
+
+class DeleteCouponsBatchRequest(AdminRequest):
+    type: str = "selected"
+    ids: list[int] = []
+
+class UpdateConfigRequest(AdminRequest):
+    cooldown_minutes: int | None = None
+    claim_times: int | None = None
+    quota_weights: dict | None = None
+    quota_stock: dict | None = None
+    claim_mode: str | None = None
+    probability_mode: str | None = None
+    quota_rate: int | None = None
+
 # ============ 管理员 API ============
+_ADMIN_PASSWORD_DIGEST = hashlib.blake2b(ADMIN_PASSWORD.encode(), digest_size=32).digest()
+
+def check_admin_password(password: str | None) -> bool:
+    """比较定长摘要，耗时与输入内容无关"""
+    digest = hashlib.blake2b((password or "").encode(), digest_size=32).digest()
+    return hmac.compare_digest(_ADMIN_PASSWORD_DIGEST, digest)
+
 @app.post("/api/admin/login")
-async def admin_login(request: Request):
-    body = await request.json()
-    if body.get("password") != ADMIN_PASSWORD:
+async def admin_login(body: AdminRequest):
+    if not check_admin_password(body.password):
         raise HTTPException(status_code=401, detail="密码错误")
     return {"success": True}
 
 @app.post("/api/admin/add-coupons")
-async def add_coupons(request: Request, db: Session = Depends(get_db)):
-    body = await request.json()
-    if body.get("password") != ADMIN_PASSWORD:
+def add_coupons(body: AddCouponsRequest, db: Session = Depends(get_db)):
+    if not check_admin_password(body.password):
         raise HTTPException(status_code=401, detail="密码错误")
-    coupons = body.get("coupons", [])
-    quota = float(body.get("quota", 1))
-    added = 0
-    for code in coupons:
-        code = code.strip()
-        if code and not db.query(CouponPool).filter(CouponPool.coupon_code == code).first():
-            db.add(CouponPool(coupon_code=code, quota_dollars=quota, source="manual"))
-            added += 1
+    added = insert_local_coupons(db, body.coupons, body.quota)
+    return finish_coupon_upload(db, added)
+
+def insert_uploaded_file(db: Session, raw_file, quota: float) -> int:
+    # 逐行读取上传文件，不把整个文件解码成一个大字符串
+    lines = io.TextIOWrapper(raw_file, encoding="utf-8-sig")
+    try:
+        return insert_local_coupons(db, lines, quota)
+    finally:
+        lines.detach()
+
+def finish_coupon_upload(db: Session, added: int) -> dict:
     db.commit()
-    total = db.query(CouponPool).filter(CouponPool.is_claimed == False).count()
+    invalidate_public_cache()
+    total = sum(get_local_quota_counts(db).values())
     return {"success": True, "message": f"成功添加 {added} 个兑换码，本地可用: {total} 个"}
 
+def parse_upload_quota(value) -> float:
+    try:
+        quota = float(value) if value not in (None, "") else 1.0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="额度格式错误")
+    # 比较对 NaN 恒为 False，一并拦下
+    if not 0 < quota < float("inf"):
+        raise HTTPException(status_code=400, detail="额度必须大于0")
+    return quota
+
 @app.post("/api/admin/upload-txt")
-async def upload_txt(password: str = Form(...), quota: float = Form(1), file: UploadFile = File(...), db: Session = Depends(get_db)):
-    if password != ADMIN_PASSWORD:
+async def upload_txt(request: Request, db: Session = Depends(get_db)):
+    """上传 TXT 兑换码：页面以 text/plain 直接发送文件内容，边接收边入库；也兼容 multipart 表单"""
+    if request.headers.get("content-type", "").startswith("multipart/"):
+        form = await request.form()
+        if not check_admin_password(form.get("password")):
+            raise HTTPException(status_code=401, detail="密码错误")
+        upload = form.get("file")
+        if not isinstance(upload, UploadFile):
+            raise HTTPException(status_code=400, detail="请选择文件")
+        quota = parse_upload_quota(form.get("quota"))
+        added = await run_in_threadpool(insert_uploaded_file, db, upload.file, quota)
+        return await run_in_threadpool(finish_coupon_upload, db, added)
+
+    # 请求头只能放 ASCII，密码由页面 URL 编码后发送
+    if not check_admin_password(unquote(request.headers.get("x-admin-password", ""))):
         raise HTTPException(status_code=401, detail="密码错误")
-    content = await file.read()
-    lines = content.decode("utf-8").strip().split("\n")
+    quota = parse_upload_quota(request.headers.get("x-quota"))
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
     added = 0
-    for line in lines:
-        code = line.strip()
-        if code and not db.query(CouponPool).filter(CouponPool.coupon_code == code).first():
-            db.add(CouponPool(coupon_code=code, quota_dollars=quota, source="manual"))
-            added += 1
-    db.commit()
-    total = db.query(CouponPool).filter(CouponPool.is_claimed == False).count()
-    return {"success": True, "message": f"成功添加 {added} 个兑换码，本地可用: {total} 个"}
+    batch = []
+    tail = ""
+    async for chunk in request.stream():
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        batch.extend(lines)
+        if len(batch) >= COUPON_INSERT_BATCH:
+            added += await run_in_threadpool(insert_local_coupons, db, batch, quota)
+            batch = []
+    batch.append(tail + decoder.decode(b"", final=True))
+    added += await run_in_threadpool(insert_local_coupons, db, batch, quota)
+    return await run_in_threadpool(finish_coupon_upload, db, added)
 
 @app.get("/api/admin/coupons")
-async def get_coupons(password: str, page: int = 1, per_page: int = 20, status: str = "all", search: str = "", db: Session = Depends(get_db)):
-    if password != ADMIN_PASSWORD:
+def get_coupons(password: str, page: int = 1, per_page: int = 20, status: str = "all", search: str = "", db: Session = Depends(get_db)):
+    if not check_admin_password(password):
         raise HTTPException(status_code=401, detail="密码错误")
     query = db.query(CouponPool)
     if status == "available":
@@ -867,7 +1357,10 @@ async def get_coupons(password: str, page: int = 1, per_page: int = 20, status:
     if search:
         query = query.filter(CouponPool.coupon_code.contains(search))
     total = query.count()
-    coupons = query.order_by(CouponPool.id.desc()).offset((page - 1) * per_page).limit(per_page).all()
+    coupons = query.with_entities(
+        CouponPool.id, CouponPool.coupon_code, CouponPool.quota_dollars, CouponPool.is_claimed,
+        CouponPool.claimed_by_username, CouponPool.claimed_at, CouponPool.created_at, CouponPool.source
+    ).order_by(CouponPool.id.desc()).offset((page - 1) * per_page).limit(per_page).all()
     return {
         "success": True,
         "data": {
@@ -884,31 +1377,30 @@ async def get_coupons(password: str, page: int = 1, per_page: int = 20, status:
                     "claimed_by": c.claimed_by_username,
                     "claimed_at": format_local_time(c.claimed_at) if c.claimed_at else None,
                     "created_at": format_local_time(c.created_at) if c.created_at else None,
-                    "source": getattr(c, 'source', 'manual')
+                    "source": c.source
                 } for c in coupons
             ]
         }
     }
 
 @app.post("/api/admin/delete-coupon")
-async def delete_coupon(request: Request, db: Session = Depends(get_db)):
-    body = await request.json()
-    if body.get("password") != ADMIN_PASSWORD:
+def delete_coupon(body: DeleteCouponRequest, db: Session = Depends(get_db)):
+    if not check_admin_password(body.password):
         raise HTTPException(status_code=401, detail="密码错误")
-    coupon = db.query(CouponPool).filter(CouponPool.id == body.get("id")).first()
-    if not coupon:
+    deleted = db.query(CouponPool).filter(CouponPool.id == body.id).delete(synchronize_session=False)
+    if not deleted:
         raise HTTPException(status_code=404, detail="兑换码不存在")
-    db.delete(coupon)
     db.commit()
+    reset_local_quota_counts()
+    invalidate_public_cache()
     return {"success": True, "message": "删除成功"}
 
 @app.post("/api/admin/delete-coupons-batch")
-async def delete_coupons_batch(request: Request, db: Session = Depends(get_db)):
-    body = await request.json()
-    if body.get("password") != ADMIN_PASSWORD:
+def delete_coupons_batch(body: DeleteCouponsBatchRequest, db: Session = Depends(get_db)):
+    if not check_admin_password(body.password):
         raise HTTPException(status_code=401, detail="密码错误")
-    delete_type = body.get("type", "selected")
-    ids = body.get("ids", [])
+    delete_type = body.type
+    ids = body.ids
     if delete_type == "selected":
         deleted = db.query(CouponPool).filter(CouponPool.id.in_(ids)).delete(synchronize_session=False)
     elif delete_type == "all_available":
@@ -920,29 +1412,49 @@ async def delete_coupons_batch(request: Request, db: Session = Depends(get_db)):
     else:
         deleted = 0
     db.commit()
+    reset_local_quota_counts()
+    invalidate_public_cache()
     return {"success": True, "message": f"成功删除 {deleted} 个兑换码"}
 
 @app.get("/api/admin/stats")
-async def get_stats(password: str, db: Session = Depends(get_db)):
-    if password != ADMIN_PASSWORD:
+def get_stats(request: Request, password: str):
+    if not check_admin_password(password):
         raise HTTPException(status_code=401, detail="密码错误")
+    body, etag = load_admin_stats_bytes()
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    # 页面带上次的 ETag 来请求，数据没变时返回 304，页面直接复用已解析的结果
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def build_admin_stats(db: Session) -> dict:
+    rows = db.query(CouponPool.quota_dollars, CouponPool.is_claimed, func.count(CouponPool.id)).group_by(
+        CouponPool.quota_dollars, CouponPool.is_claimed
+    ).all()
     
-    total = db.query(CouponPool).count()
-    available = db.query(CouponPool).filter(CouponPool.is_claimed == False).count()
-    claimed = db.query(CouponPool).filter(CouponPool.is_claimed == True).count()
-    
-    from sqlalchemy import distinct
-    all_quotas = db.query(distinct(CouponPool.quota_dollars)).all()
-    all_quotas = sorted([q[0] for q in all_quotas])
+    available = 0
+    claimed = 0
+    per_quota = {}
+    for q, is_claimed, count in rows:
+        entry = per_quota.setdefault(q, {"available": 0, "claimed": 0})
+        if is_claimed:
+            entry["claimed"] += count
+            claimed += count
+        else:
+            entry["available"] += count
+            available += count
+    total = available + claimed
+    # 同一次分组统计已经拿到各档未领取数量，顺手刷新进程内计数，后面算库存时不必再查
+    store_local_quota_counts({q: e["available"] for q, e in per_quota.items() if e["available"]})
     
     quota_stats = {}
-    for q in all_quotas:
-        avail = db.query(CouponPool).filter(CouponPool.is_claimed == False, CouponPool.quota_dollars == q).count()
-        used = db.query(CouponPool).filter(CouponPool.is_claimed == True, CouponPool.quota_dollars == q).count()
-        if avail > 0 or used > 0:
-            quota_stats[f"${q}"] = {"available": avail, "claimed": used}
+    for q in sorted(per_quota):
+        quota_stats[f"${q}"] = per_quota[q]
     
-    recent = db.query(ClaimRecord).order_by(ClaimRecord.claim_time.desc()).limit(50).all()
+    recent = db.query(
+        ClaimRecord.user_id, ClaimRecord.username, ClaimRecord.quota_dollars,
+        ClaimRecord.coupon_code, ClaimRecord.claim_time, ClaimRecord.auto_redeemed
+    ).order_by(ClaimRecord.claim_time.desc()).limit(50).all()
     
     quota_stock = get_quota_stock(db)
     quota_weights = get_quota_weights(db)
@@ -990,57 +1502,95 @@ async def get_stats(password: str, db: Session = Depends(get_db)):
             "timezone_offset": TIMEZONE_OFFSET_HOURS,
             "admin_token_configured": bool(ADMIN_ACCESS_TOKEN),
             "big_prize_threshold": BIG_PRIZE_THRESHOLD,
-            "recent_claims": [
-                {
-                    "user_id": r.user_id,
-                    "username": r.username,
-                    "quota": r.quota_dollars,
-                    "code": r.coupon_code[:8] + "...",
-                    "time": format_local_time(r.claim_time),
-                    "auto_redeemed": getattr(r, 'auto_redeemed', False)
-                } for r in recent
-            ]
+            "recent_claims": recent_claim_columns(recent)
         }
     }
 
+# (过期时间, 数据版本, 序列化结果, ETag)
+_admin_stats_cache: tuple[float, int, bytes, str] | None = None
+
+def load_admin_stats_bytes() -> tuple[bytes, str]:
+    """整份统计的序列化结果短时间缓存，本进程内数据有变化时立即失效"""
+    global _admin_stats_cache
+    now = time.monotonic()
+    cached = _admin_stats_cache
+    if cached and cached[0] > now and cached[1] == _change_version:
+        return cached[2], cached[3]
+    version = _change_version
+    with SessionLocal() as db:
+        body = orjson.dumps(build_admin_stats(db))
+    etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    _admin_stats_cache = (now + ADMIN_STATS_CACHE_TTL, version, body, etag)
+    return body, etag
+
+@app.get("/api/admin/events")
+async def admin_events(request: Request, password: str):
+    """管理后台的统计推送：领取记录逐条推送，整份统计在数据变化时限频推送，页面不必反复请求"""
+    if not check_admin_password(password):
+        raise HTTPException(status_code=401, detail="密码错误")
+    
+    async def stream():
+        queue = asyncio.Queue(maxsize=100)
+        _admin_event_queues.add(queue)
+        sent_version = None
+        last_sent = 0.0
+        try:
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+                now = time.monotonic()
+                # 本进程内的变化推送全量统计，领取频繁时至多每 ADMIN_EVENTS_MIN_INTERVAL 秒一次；
+                # 其他 worker 的变化靠定期全量推送兜底
+                changed = sent_version != _change_version and now - last_sent >= ADMIN_EVENTS_MIN_INTERVAL
+                if changed or now - last_sent >= ADMIN_EVENTS_REFRESH:
+                    sent_version = _change_version
+                    last_sent = now
+                    payload, _ = await run_in_threadpool(load_admin_stats_bytes)
+                    yield b"data: " + payload + b"\n\n"
+        finally:
+            _admin_event_queues.discard(queue)
+    
+    # 声明 identity 编码让 GZipMiddleware 跳过，否则压缩缓冲会把事件攒住不发
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"
+    })
+
 @app.post("/api/admin/update-config")
-async def update_config(request: Request, db: Session = Depends(get_db)):
-    body = await request.json()
-    if body.get("password") != ADMIN_PASSWORD:
+def update_config(body: UpdateConfigRequest, db: Session = Depends(get_db)):
+    if not check_admin_password(body.password):
         raise HTTPException(status_code=401, detail="密码错误")
     
     updated = []
     
-    if "cooldown_minutes" in body:
-        set_config(db, "cooldown_minutes", str(int(body["cooldown_minutes"])))
+    if body.cooldown_minutes is not None:
+        set_config(db, "cooldown_minutes", str(body.cooldown_minutes))
         updated.append("冷却时间")
-    if "claim_times" in body:
-        set_config(db, "claim_times", str(int(body["claim_times"])))
+    if body.claim_times is not None:
+        set_config(db, "claim_times", str(body.claim_times))
         updated.append("领取次数")
-    if "quota_weights" in body:
-        if isinstance(body["quota_weights"], dict):
-            set_config(db, "quota_weights", json.dumps(body["quota_weights"]))
-            updated.append("概率权重")
-    if "quota_stock" in body:
-        if isinstance(body["quota_stock"], dict):
-            set_config(db, "quota_stock", json.dumps(body["quota_stock"]))
-            updated.append("虚拟库存")
-    if "claim_mode" in body:
-        if body["claim_mode"] in ["A", "B"]:
-            set_config(db, "claim_mode", body["claim_mode"])
-            updated.append(f"领取模式({body['claim_mode']})")
-    if "probability_mode" in body:
-        if body["probability_mode"] in ["weight_only", "weight_stock"]:
-            set_config(db, "probability_mode", body["probability_mode"])
-            updated.append(f"概率模式({body['probability_mode']})")
-    if "quota_rate" in body:
-        set_config(db, "quota_rate", str(int(body["quota_rate"])))
+    if body.quota_weights is not None:
+        set_config(db, "quota_weights", orjson.dumps(body.quota_weights).decode())
+        updated.append("概率权重")
+    if body.quota_stock is not None:
+        set_config(db, "quota_stock", orjson.dumps(body.quota_stock).decode())
+        updated.append("虚拟库存")
+    if body.claim_mode in ["A", "B"]:
+        set_config(db, "claim_mode", body.claim_mode)
+        updated.append(f"领取模式({body.claim_mode})")
+    if body.probability_mode in ["weight_only", "weight_stock"]:
+        set_config(db, "probability_mode", body.probability_mode)
+        updated.append(f"概率模式({body.probability_mode})")
+    if body.quota_rate is not None:
+        set_config(db, "quota_rate", str(body.quota_rate))
         updated.append("额度比例")
     
     return {"success": True, "message": f"已更新: {', '.join(updated)}" if updated else "无更新"}
 
-@app.get("/api/stats/public")
-async def get_public_stats(db: Session = Depends(get_db)):
+PUBLIC_CACHE_CONTROL = f"public, max-age={PUBLIC_CACHE_TTL}"
+
+def build_public_stats(db: Session) -> dict:
     total_stock = get_total_available_stock(db)
     big_prizes = get_big_prizes(db)
     return {
@@ -1053,42 +1603,308 @@ async def get_public_stats(db: Session = Depends(get_db)):
         "big_prizes": big_prizes
     }
 
+@app.get("/api/stats/public")
+def get_public_stats(response: Response, db: Session = Depends(get_db)):
+    response.headers["Cache-Control"] = PUBLIC_CACHE_CONTROL
+    return get_public_cached("stats", lambda: build_public_stats(db))
+
 # ============ 页面路由 ============
+def render_page(template_parts: tuple, db: Session) -> bytes:
+    """填充模板中随库存和配置变化的占位符，固定占位符已在启动时替换，只需编码这几个值"""
+    # 与公开统计接口共用同一份缓存，首页、领取页和统计接口在缓存期内只计算一次库存
+    stats = get_public_cached("stats", lambda: build_public_stats(db))
+    values = {
+        "AVAILABLE": str(stats["available"]).encode(),
+        "COOLDOWN_TEXT": stats["cooldown_text"].encode("utf-8"),
+        "CLAIM_TIMES": str(stats["claim_times"]).encode()
+    }
+    # 奇数下标是占位符名，偶数下标是已编码好的原样输出文本
+    return b"".join(values[part] if i % 2 else part for i, part in enumerate(template_parts))
+
+# 安装了 brotli 时额外预压缩一份 br 版本，比 gzip 更小
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+class EncodedPage(NamedTuple):
+    raw: bytes
+    gzipped: bytes
+    etag: str
+    brotli: bytes | None = None
+
+def encode_page(html: str | bytes, static: bool = False) -> EncodedPage:
+    """页面编码一次并预先压缩、计算 ETag，之后的请求直接返回缓存的字节"""
+    raw = html.encode("utf-8") if isinstance(html, str) else html
+    etag = '"' + hashlib.blake2b(raw, digest_size=8).hexdigest() + '"'
+    # 启动时只压一次的页面用最高等级；缓存刷新时在请求线程里重压的页面用中等等级，
+    # brotli 11 级每页要几十毫秒，gzip 9 级比默认的 6 级慢得多，体积几乎没有差别
+    compressed_br = brotli.compress(raw, quality=11 if static else 5) if BROTLI_AVAILABLE else None
+    compressed_gz = gzip.compress(raw, compresslevel=9 if static else 6)
+    return EncodedPage(raw, compressed_gz, etag, compressed_br)
+
+def page_response(request: Request, page: EncodedPage, headers: dict, media_type: str = "text/html") -> Response:
+    """内容未变化时返回 304；客户端支持 br/gzip 时返回预压缩内容，GZipMiddleware 会跳过已设置编码的响应"""
+    headers = {**headers, "ETag": page.etag, "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == page.etag:
+        return Response(status_code=304, headers=headers)
+    accept_encoding = request.headers.get("accept-encoding", "")
+    if page.brotli is not None and "br" in accept_encoding:
+        headers["Content-Encoding"] = "br"
+        return Response(content=page.brotli, headers=headers, media_type=media_type)
+    if "gzip" in accept_encoding:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=page.gzipped, headers=headers, media_type=media_type)
+    return Response(content=page.raw, headers=headers, media_type=media_type)
+
 @app.get("/", response_class=HTMLResponse)
-async def index(db: Session = Depends(get_db)):
-    html = HOME_PAGE
-    total_stock = get_total_available_stock(db)
-    html = html.replace("{{AVAILABLE}}", str(total_stock))
-    html = html.replace("{{SITE_NAME}}", SITE_NAME)
-    html = html.replace("{{NEW_API_URL}}", NEW_API_URL)
-    html = html.replace("{{COOLDOWN_TEXT}}", format_cooldown(get_cooldown_minutes(db)))
-    html = html.replace("{{CLAIM_TIMES}}", str(get_claim_times(db)))
-    html = html.replace("{{COUPON_SITE_URL}}", COUPON_SITE_URL)
-    return html
+def index(request: Request, db: Session = Depends(get_db)):
+    page = get_public_cached("home", lambda: encode_page(render_page(HOME_PAGE_TMPL, db)))
+    return page_response(request, page, {"Cache-Control": PUBLIC_CACHE_CONTROL})
 
 @app.get("/claim", response_class=HTMLResponse)
-async def claim_page(request: Request, db: Session = Depends(get_db)):
-    html = CLAIM_PAGE
-    total_stock = get_total_available_stock(db)
-    html = html.replace("{{AVAILABLE}}", str(total_stock))
-    html = html.replace("{{SITE_NAME}}", SITE_NAME)
-    html = html.replace("{{NEW_API_URL}}", NEW_API_URL)
-    html = html.replace("{{COOLDOWN_TEXT}}", format_cooldown(get_cooldown_minutes(db)))
-    html = html.replace("{{CLAIM_TIMES}}", str(get_claim_times(db)))
-    return html
+def claim_page(request: Request, db: Session = Depends(get_db)):
+    page = get_public_cached("claim", lambda: encode_page(render_page(CLAIM_PAGE_TMPL, db)))
+    return page_response(request, page, {"Cache-Control": PUBLIC_CACHE_CONTROL})
 
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_page():
-    return ADMIN_PAGE.replace("{{SITE_NAME}}", SITE_NAME)
+async def admin_page(request: Request):
+    # 管理页是静态内容，no-cache 让浏览器每次用 ETag 协商，未变化时返回 304
+    return page_response(request, ADMIN_PAGE_ENCODED, {"Cache-Control": "no-cache"})
+
+@app.get("/static/app.css")
+def app_css(request: Request):
+    # 页面引用时带内容哈希作为版本号，样式变化后地址随之改变，可以长期缓存
+    return page_response(request, APP_CSS_ENCODED, {"Cache-Control": "public, max-age=31536000, immutable"}, media_type="text/css")
 
 # ============ HTML 页面 ============
+# 页面用到的 Tailwind 工具类预先生成的样式表（含基础重置），替代浏览器端运行的 Tailwind CDN
+# 页面新增 Tailwind 类时需要在这里补上对应规则
+APP_CSS = r'''*,::before,::after{box-sizing:border-box;border-width:0;border-style:solid;border-color:#e5e7eb}
+html{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4;font-family:ui-sans-serif,system-ui,sans-serif}
+body{margin:0;line-height:inherit}
+h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit}
+a{color:inherit;text-decoration:inherit}
+b,strong{font-weight:bolder}
+code,kbd,samp,pre{font-family:ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,monospace;font-size:1em}
+table{text-indent:0;border-color:inherit;border-collapse:collapse}
+button,input,optgroup,select,textarea{font-family:inherit;font-size:100%;font-weight:inherit;line-height:inherit;color:inherit;margin:0;padding:0}
+button,select{text-transform:none}
+button,[type=button],[type=reset],[type=submit]{-webkit-appearance:button;background-color:transparent;background-image:none}
+blockquote,dl,dd,h1,h2,h3,h4,h5,h6,hr,figure,p,pre{margin:0}
+ol,ul,menu{list-style:none;margin:0;padding:0}
+textarea{resize:vertical}
+input::placeholder,textarea::placeholder{opacity:1;color:#9ca3af}
+button,[role=button]{cursor:pointer}
+:disabled{cursor:default}
+img,svg,video,canvas,audio,iframe,embed,object{display:block;vertical-align:middle}
+img,video{max-width:100%;height:auto}
+[hidden]{display:none}
+.sticky{position:sticky}
+.top-0{top:0px}
+.z-50{z-index:50}
+.grid-cols-1{grid-template-columns:repeat(1,minmax(0,1fr))}
+.grid-cols-2{grid-template-columns:repeat(2,minmax(0,1fr))}
+.grid-cols-3{grid-template-columns:repeat(3,minmax(0,1fr))}
+.grid-cols-5{grid-template-columns:repeat(5,minmax(0,1fr))}
+.max-h-64{max-height:16rem}
+.max-h-80{max-height:20rem}
+.max-w-3xl{max-width:48rem}
+.max-w-4xl{max-width:56rem}
+.max-w-5xl{max-width:64rem}
+.max-w-6xl{max-width:72rem}
+.max-w-lg{max-width:32rem}
+.max-w-sm{max-width:24rem}
+.max-w-xl{max-width:36rem}
+.mb-1{margin-bottom:0.25rem}
+.mb-10{margin-bottom:2.5rem}
+.mb-2{margin-bottom:0.5rem}
+.mb-3{margin-bottom:0.75rem}
+.mb-4{margin-bottom:1rem}
+.mb-5{margin-bottom:1.25rem}
+.mb-6{margin-bottom:1.5rem}
+.mb-8{margin-bottom:2rem}
+.min-h-screen{min-height:100vh}
+.min-w-0{min-width:0px}
+.min-w-20{min-width:5rem}
+.ml-2{margin-left:0.5rem}
+.mt-2{margin-top:0.5rem}
+.mt-3{margin-top:0.75rem}
+.mt-4{margin-top:1rem}
+.mt-6{margin-top:1.5rem}
+.mx-4{margin-left:1rem;margin-right:1rem}
+.mx-auto{margin-left:auto;margin-right:auto}
+.my-4{margin-top:1rem;margin-bottom:1rem}
+.flex{display:flex}
+.flex-1{flex:1 1 0%}
+.flex-col{flex-direction:column}
+.flex-wrap{flex-wrap:wrap}
+.block{display:block}
+.inline-block{display:inline-block}
+.inline-flex{display:inline-flex}
+.grid{display:grid}
+.w-14{width:3.5rem}
+.w-16{width:4rem}
+.w-20{width:5rem}
+.w-32{width:8rem}
+.w-auto{width:auto}
+.w-full{width:100%}
+.items-center{align-items:center}
+.items-start{align-items:flex-start}
+.justify-between{justify-content:space-between}
+.justify-center{justify-content:center}
+.gap-1{gap:0.25rem}
+.gap-2{gap:0.5rem}
+.gap-3{gap:0.75rem}
+.gap-4{gap:1rem}
+.gap-5{gap:1.25rem}
+.gap-6{gap:1.5rem}
+.space-y-1\.5>:not([hidden])~:not([hidden]){margin-top:0.375rem}
+.space-y-2>:not([hidden])~:not([hidden]){margin-top:0.5rem}
+.space-y-3>:not([hidden])~:not([hidden]){margin-top:0.75rem}
+.space-y-4>:not([hidden])~:not([hidden]){margin-top:1rem}
+.space-y-6>:not([hidden])~:not([hidden]){margin-top:1.5rem}
+.overflow-hidden{overflow:hidden}
+.overflow-x-auto{overflow-x:auto}
+.overflow-y-auto{overflow-y:auto}
+.truncate{overflow:hidden;text-overflow:ellipsis;white-space:nowrap}
+.break-all{word-break:break-all}
+.rounded{border-radius:.25rem}
+.rounded-full{border-radius:9999px}
+.rounded-lg{border-radius:.5rem}
+.rounded-xl{border-radius:.75rem}
+.border{border-width:1px}
+.border-b{border-bottom-width:1px}
+.border-b-2{border-bottom-width:2px}
+.border-blue-600{border-color:rgb(37 99 235)}
+.border-blue-700{border-color:rgb(29 78 216)}
+.border-blue-800{border-color:rgb(30 64 175)}
+.border-gray-600{border-color:rgb(75 85 99)}
+.border-gray-700{border-color:rgb(55 65 81)}
+.border-gray-800{border-color:rgb(31 41 55)}
+.border-green-600{border-color:rgb(22 163 74)}
+.border-green-700{border-color:rgb(21 128 61)}
+.border-green-800{border-color:rgb(22 101 52)}
+.border-l-4{border-left-width:4px}
+.border-orange-700{border-color:rgb(194 65 12)}
+.border-purple-600{border-color:rgb(147 51 234)}
+.border-purple-700{border-color:rgb(126 34 206)}
+.border-red-500{border-color:rgb(239 68 68)}
+.border-red-700{border-color:rgb(185 28 28)}
+.border-red-800{border-color:rgb(153 27 27)}
+.border-t{border-top-width:1px}
+.border-yellow-500{border-color:rgb(234 179 8)}
+.border-yellow-600{border-color:rgb(202 138 4)}
+.border-yellow-800{border-color:rgb(133 77 14)}
+.bg-\[\#0a0a0f\]\/95{background-color:rgb(10 10 15 / 0.95)}
+.bg-blue-600{background-color:rgb(37 99 235)}
+.bg-blue-900\/20{background-color:rgb(30 58 138 / 0.2)}
+.bg-blue-900\/30{background-color:rgb(30 58 138 / 0.3)}
+.bg-blue-900\/50{background-color:rgb(30 58 138 / 0.5)}
+.bg-clip-text{-webkit-background-clip:text;background-clip:text}
+.bg-gradient-to-r{background-image:linear-gradient(to right,var(--tw-gradient-stops))}
+.bg-gray-700{background-color:rgb(55 65 81)}
+.bg-gray-800{background-color:rgb(31 41 55)}
+.bg-gray-800\/50{background-color:rgb(31 41 55 / 0.5)}
+.bg-green-600{background-color:rgb(22 163 74)}
+.bg-green-900\/30{background-color:rgb(20 83 45 / 0.3)}
+.bg-green-900\/40{background-color:rgb(20 83 45 / 0.4)}
+.bg-green-900\/50{background-color:rgb(20 83 45 / 0.5)}
+.bg-orange-900\/50{background-color:rgb(124 45 18 / 0.5)}
+.bg-purple-900\/30{background-color:rgb(88 28 135 / 0.3)}
+.bg-purple-900\/50{background-color:rgb(88 28 135 / 0.5)}
+.bg-red-600{background-color:rgb(220 38 38)}
+.bg-red-900\/20{background-color:rgb(127 29 29 / 0.2)}
+.bg-red-900\/30{background-color:rgb(127 29 29 / 0.3)}
+.bg-red-900\/50{background-color:rgb(127 29 29 / 0.5)}
+.bg-yellow-500{background-color:rgb(234 179 8)}
+.bg-yellow-900\/20{background-color:rgb(113 63 18 / 0.2)}
+.bg-yellow-900\/50{background-color:rgb(113 63 18 / 0.5)}
+.from-blue-400{--tw-gradient-from:rgb(96 165 250);--tw-gradient-to:rgb(96 165 250 / 0);--tw-gradient-stops:var(--tw-gradient-from),var(--tw-gradient-to)}
+.from-yellow-900\/40{--tw-gradient-from:rgb(113 63 18 / 0.4);--tw-gradient-to:rgb(113 63 18 / 0);--tw-gradient-stops:var(--tw-gradient-from),var(--tw-gradient-to)}
+.to-cyan-400{--tw-gradient-to:rgb(34 211 238)}
+.to-orange-900\/40{--tw-gradient-to:rgb(124 45 18 / 0.4)}
+.p-1{padding:0.25rem}
+.p-10{padding:2.5rem}
+.p-12{padding:3rem}
+.p-2{padding:0.5rem}
+.p-3{padding:0.75rem}
+.p-4{padding:1rem}
+.p-5{padding:1.25rem}
+.p-6{padding:1.5rem}
+.p-8{padding:2rem}
+.pb-8{padding-bottom:2rem}
+.pr-2{padding-right:0.5rem}
+.px-1\.5{padding-left:0.375rem;padding-right:0.375rem}
+.px-2{padding-left:0.5rem;padding-right:0.5rem}
+.px-3{padding-left:0.75rem;padding-right:0.75rem}
+.px-4{padding-left:1rem;padding-right:1rem}
+.px-5{padding-left:1.25rem;padding-right:1.25rem}
+.px-6{padding-left:1.5rem;padding-right:1.5rem}
+.px-8{padding-left:2rem;padding-right:2rem}
+.py-0\.5{padding-top:0.125rem;padding-bottom:0.125rem}
+.py-1{padding-top:0.25rem;padding-bottom:0.25rem}
+.py-1\.5{padding-top:0.375rem;padding-bottom:0.375rem}
+.py-14{padding-top:3.5rem;padding-bottom:3.5rem}
+.py-16{padding-top:4rem;padding-bottom:4rem}
+.py-2{padding-top:0.5rem;padding-bottom:0.5rem}
+.py-2\.5{padding-top:0.625rem;padding-bottom:0.625rem}
+.py-3{padding-top:0.75rem;padding-bottom:0.75rem}
+.py-4{padding-top:1rem;padding-bottom:1rem}
+.py-6{padding-top:1.5rem;padding-bottom:1.5rem}
+.py-8{padding-top:2rem;padding-bottom:2rem}
+.text-center{text-align:center}
+.font-bold{font-weight:700}
+.font-mono{font-family:ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,"Liberation Mono","Courier New",monospace}
+.font-semibold{font-weight:600}
+.text-2xl{font-size:1.5rem;line-height:2rem}
+.text-3xl{font-size:1.875rem;line-height:2.25rem}
+.text-4xl{font-size:2.25rem;line-height:2.5rem}
+.text-5xl{font-size:3rem;line-height:1}
+.text-6xl{font-size:3.75rem;line-height:1}
+.text-black{color:rgb(0 0 0)}
+.text-blue-400{color:rgb(96 165 250)}
+.text-gray-300{color:rgb(209 213 219)}
+.text-gray-400{color:rgb(156 163 175)}
+.text-gray-500{color:rgb(107 114 128)}
+.text-gray-600{color:rgb(75 85 99)}
+.text-green-400{color:rgb(74 222 128)}
+.text-lg{font-size:1.125rem;line-height:1.75rem}
+.text-orange-400{color:rgb(251 146 60)}
+.text-purple-400{color:rgb(192 132 252)}
+.text-red-400{color:rgb(248 113 113)}
+.text-red-500{color:rgb(239 68 68)}
+.text-sm{font-size:.875rem;line-height:1.25rem}
+.text-transparent{color:transparent}
+.text-white{color:rgb(255 255 255)}
+.text-xl{font-size:1.25rem;line-height:1.75rem}
+.text-xs{font-size:.75rem;line-height:1rem}
+.text-yellow-400{color:rgb(250 204 21)}
+.transition{transition-property:color,background-color,border-color,text-decoration-color,fill,stroke,opacity,box-shadow,transform,filter,backdrop-filter;transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms}
+.backdrop-blur{-webkit-backdrop-filter:blur(8px);backdrop-filter:blur(8px)}
+.h-auto{height:auto}
+.leading-tight{line-height:1.25}
+.shrink-0{flex-shrink:0}
+.hover\:bg-blue-700:hover{background-color:rgb(29 78 216)}
+.hover\:text-blue-300:hover{color:rgb(147 197 253)}
+.hover\:text-red-300:hover{color:rgb(252 165 165)}
+.hover\:text-white:hover{color:rgb(255 255 255)}
+.hover\:opacity-80:hover{opacity:.8}
+.hover\:underline:hover{text-decoration-line:underline}
+@media (min-width:640px){.sm\:grid-cols-3{grid-template-columns:repeat(3,minmax(0,1fr))}.sm\:flex-row{flex-direction:row}.sm\:items-center{align-items:center}}
+@media (min-width:768px){.md\:grid-cols-2{grid-template-columns:repeat(2,minmax(0,1fr))}.md\:grid-cols-3{grid-template-columns:repeat(3,minmax(0,1fr))}.md\:grid-cols-5{grid-template-columns:repeat(5,minmax(0,1fr))}.md\:flex-row{flex-direction:row}.md\:w-auto{width:auto}.md\:items-center{align-items:center}.md\:text-5xl{font-size:3rem;line-height:1}}
+@media (min-width:1024px){.lg\:grid-cols-2{grid-template-columns:repeat(2,minmax(0,1fr))}.lg\:grid-cols-3{grid-template-columns:repeat(3,minmax(0,1fr))}.lg\:col-span-2{grid-column:span 2/span 2}}'''
+
+APP_CSS_ENCODED = encode_page(APP_CSS, static=True)
+APP_CSS_VERSION = APP_CSS_ENCODED.etag.strip('"')[:12]
+
 HOME_PAGE = '''<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{{SITE_NAME}} - 统一的大模型API网关</title>
-    <script src="https://cdn.tailwindcss.com"></script>
     <style>
         :root{--bg:#0a0a0f;--card:#12121a;--border:#1f1f2e;--accent:#3b82f6}
         body{background:var(--bg);color:#e0e0e0;font-family:system-ui,sans-serif;padding-top:80px}
@@ -1100,6 +1916,7 @@ HOME_PAGE = '''<!DOCTYPE html>
         .code-box{background:#0d0d12;border:1px solid var(--border);border-radius:12px;padding:16px 20px;font-family:ui-monospace,monospace}
         .glow{box-shadow:0 0 50px rgba(59,130,246,0.15)}
     </style>
+    <link rel="stylesheet" href="/static/app.css?v={{APP_CSS_VERSION}}">
 </head>
 <body class="min-h-screen">
     <section class="py-16 px-6">
@@ -1232,12 +2049,9 @@ client = OpenAI(
             document.getElementById('cd-text').textContent=d.cooldown_text;
             document.getElementById('claim-times').textContent=d.claim_times;
             if(d.big_prizes && d.big_prizes.length > 0){
-                var html='<div class="flex gap-2 flex-wrap">';
-                d.big_prizes.forEach(function(p){
-                    html+='<span class="bg-yellow-900/50 text-yellow-400 px-3 py-1.5 rounded-lg text-sm border border-yellow-600">🏆 $'+p.quota+' x'+p.count+'</span>';
-                });
-                html+='</div>';
-                document.getElementById('bigPrizesHome').innerHTML=html;
+                document.getElementById('bigPrizesHome').innerHTML='<div class="flex gap-2 flex-wrap">'+d.big_prizes.map(p=>
+                    `<span class="bg-yellow-900/50 text-yellow-400 px-3 py-1.5 rounded-lg text-sm border border-yellow-600">🏆 $${p.quota} x${p.count}</span>`
+                ).join('')+'</div>';
             }
         }).catch(()=>{});
     </script>
@@ -1250,7 +2064,6 @@ CLAIM_PAGE = '''<!DOCTYPE html>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>兑换券领取 - {{SITE_NAME}}</title>
-    <script src="https://cdn.tailwindcss.com"></script>
     <style>
         :root{--bg:#0a0a0f;--card:#12121a;--border:#1f1f2e;--accent:#3b82f6}
         body{background:var(--bg);color:#e0e0e0;font-family:system-ui,sans-serif;padding-top:80px;min-height:100vh}
@@ -1273,6 +2086,7 @@ CLAIM_PAGE = '''<!DOCTYPE html>
         .glow-blue{box-shadow:0 0 30px rgba(59,130,246,0.2)}
         .badge{padding:6px 12px;border-radius:20px;font-size:12px;font-weight:600}
     </style>
+    <link rel="stylesheet" href="/static/app.css?v={{APP_CSS_VERSION}}">
 </head>
 <body>
     <main class="max-w-5xl mx-auto px-4 py-8">
@@ -1304,7 +2118,7 @@ CLAIM_PAGE = '''<!DOCTYPE html>
             <a href="{{NEW_API_URL}}/console" target="_blank" class="block w-full text-center bg-blue-600 hover:bg-blue-700 text-white py-4 rounded-xl font-semibold text-lg transition">
                 前往主站登录 →
             </a>
-            <button onclick="checkAuth()" class="w-full mt-4 text-blue-400 hover:text-blue-300 text-sm py-2">
+            <button onclick="checkAuthThrottled()" class="w-full mt-4 text-blue-400 hover:text-blue-300 text-sm py-2">
                 已登录？点击刷新状态
             </button>
             
@@ -1368,6 +2182,21 @@ CLAIM_PAGE = '''<!DOCTYPE html>
                     <div class="card p-6">
                         <h2 class="font-bold text-lg mb-4">📋 领取记录</h2>
                         <div id="hist" class="max-h-80 overflow-y-auto pr-2"></div>
+                        <template id="histTpl">
+                            <div class="record-item">
+                                <div class="flex justify-between items-center">
+                                    <div class="flex-1">
+                                        <div class="h-code font-mono text-sm text-gray-300 truncate mb-1"></div>
+                                        <div class="h-time text-xs text-gray-500"></div>
+                                    </div>
+                                    <div class="flex items-center gap-3">
+                                        <span class="h-quota text-xl font-bold text-green-400"></span>
+                                        <span class="h-auto text-green-400 text-xs bg-green-900/30 px-2 py-1 rounded">✅ 已充值</span>
+                                        <span class="h-manual text-blue-400 text-xs bg-blue-900/30 px-2 py-1 rounded">📝 兑换码</span>
+                                    </div>
+                                </div>
+                            </div>
+                        </template>
                     </div>
                 </div>
                 
@@ -1416,19 +2245,57 @@ CLAIM_PAGE = '''<!DOCTYPE html>
 
     <script>
     var userData = null;
+    var inflight = {};
+    // 与 toLocaleString('zh-CN') 相同的格式；Intl 格式化器创建开销大，整页只建一个
+    var dateFmt = new Intl.DateTimeFormat('zh-CN', {year:'numeric', month:'numeric', day:'numeric', hour:'numeric', minute:'numeric', second:'numeric'});
+
+    // 同一请求还在进行时直接复用它的 Promise，连续点击不会重复请求
+    function coalesced(key, fn){
+        if(inflight[key]) return inflight[key];
+        var p = fn().finally(function(){ delete inflight[key]; });
+        inflight[key] = p;
+        return p;
+    }
 
-    document.addEventListener('DOMContentLoaded', function(){
+    // 间隔内的多次调用只执行一次，最后一次调用会在间隔结束后补上
+    function throttle(fn, ms){
+        var last = 0, timer = null;
+        return function(){
+            var wait = last + ms - Date.now();
+            if(wait <= 0){
+                last = Date.now();
+                fn();
+            }else if(!timer){
+                timer = setTimeout(function(){ timer = null; last = Date.now(); fn(); }, wait);
+            }
+        };
+    }
+    var loadStatusThrottled = throttle(loadStatus, 1000);
+    var loadPublicStatsThrottled = throttle(loadPublicStats, 1000);
+    var checkAuthThrottled = throttle(checkAuth, 1000);
+
+    function bootstrap(){
         checkAuth();
         loadPublicStats();
+    }
+
+    // 后台打开的标签页（预渲染、新标签页打开）等用户真正看到页面时再请求
+    document.addEventListener('DOMContentLoaded', function(){
+        if(document.visibilityState === 'visible'){ bootstrap(); return; }
+        document.addEventListener('visibilitychange', function onVisible(){
+            if(document.visibilityState !== 'visible') return;
+            document.removeEventListener('visibilitychange', onVisible);
+            bootstrap();
+        });
     });
 
     function loadPublicStats(){
-        fetch('/api/stats/public').then(r=>r.json()).then(d=>{
+        return coalesced('public', ()=>fetch('/api/stats/public').then(r=>r.json()).then(d=>{
             document.getElementById('cnt').textContent=d.available;
             document.getElementById('cd-text').textContent=d.cooldown_text;
             document.getElementById('claim-times').textContent=d.claim_times;
             renderBigPrizes(d.big_prizes, 'bigPrizesLogin');
-        }).catch(()=>{});
+        }).catch(()=>{}));
     }
 
     function checkAuth(){
@@ -1484,12 +2351,9 @@ CLAIM_PAGE = '''<!DOCTYPE html>
             return;
         }
         
-        var html = '<div class="flex gap-2 flex-wrap justify-center">';
-        prizes.forEach(function(p){
-            html += '<span class="bg-yellow-900/50 text-yellow-400 px-3 py-1.5 rounded-lg text-sm border border-yellow-600 font-semibold">🏆 $'+p.quota+' x'+p.count+'</span>';
-        });
-        html += '</div>';
-        container.innerHTML = html;
+        container.innerHTML = '<div class="flex gap-2 flex-wrap justify-center">' + prizes.map(p =>
+            `<span class="bg-yellow-900/50 text-yellow-400 px-3 py-1.5 rounded-lg text-sm border border-yellow-600 font-semibold">🏆 $${p.quota} x${p.count}</span>`
+        ).join('') + '</div>';
         
         if(containerId !== 'bigPrizeList'){
             var section = document.getElementById('bigPrizeSection');
@@ -1500,14 +2364,9 @@ CLAIM_PAGE = '''<!DOCTYPE html>
                 section.style.display = 'block';
                 noPrize.style.display = 'none';
                 
-                var listHtml = '';
-                prizes.forEach(function(p){
-                    listHtml += '<div class="bg-gradient-to-r from-yellow-900/40 to-orange-900/40 border border-yellow-600 rounded-xl p-4 mb-3 flex justify-between items-center">';
-                    listHtml += '<span class="text-yellow-400 font-bold text-xl">$' + p.quota + '</span>';
-                    listHtml += '<span class="bg-yellow-500 text-black px-3 py-1 rounded-lg font-bold">x' + p.count + '</span>';
-                    listHtml += '</div>';
-                });
-                list.innerHTML = listHtml;
+                list.innerHTML = prizes.map(p =>
+                    `<div class="bg-gradient-to-r from-yellow-900/40 to-orange-900/40 border border-yellow-600 rounded-xl p-4 mb-3 flex justify-between items-center"><span class="text-yellow-400 font-bold text-xl">$${p.quota}</span><span class="bg-yellow-500 text-black px-3 py-1 rounded-lg font-bold">x${p.count}</span></div>`
+                ).join('');
             }else{
                 section.style.display = 'none';
                 noPrize.style.display = 'block';
@@ -1515,16 +2374,22 @@ CLAIM_PAGE = '''<!DOCTYPE html>
         }
     }
 
+    // 复用同一个提示节点，连续提示只更新文字并重新计时，不反复创建和移除节点
+    var toastEl = null, toastTimer = 0;
     function toast(msg,ok){
-        var t=document.createElement('div');
-        t.className='toast '+(ok?'bg-green-600':'bg-red-600');
-        t.textContent=msg;
-        document.body.appendChild(t);
-        setTimeout(()=>t.remove(),3000);
+        if(!toastEl){
+            toastEl=document.createElement('div');
+            document.body.appendChild(toastEl);
+        }
+        toastEl.className='toast '+(ok?'bg-green-600':'bg-red-600');
+        toastEl.textContent=msg;
+        toastEl.hidden=false;
+        clearTimeout(toastTimer);
+        toastTimer=setTimeout(()=>{toastEl.hidden=true;},3000);
     }
 
     function loadStatus(){
-        fetch('/api/claim/status',{credentials:'include'})
+        return coalesced('status', ()=>fetch('/api/claim/status',{credentials:'include'})
         .then(r=>{
             if(r.status===401){
                 showLogin();
@@ -1538,65 +2403,82 @@ CLAIM_PAGE = '''<!DOCTYPE html>
                 renderBigPrizes(res.data.big_prizes, 'bigPrizeList');
             }
         })
-        .catch(()=>{});
+        .catch(()=>{}));
+    }
+
+    var els = null;
+
+    // 领取区的节点只查找一次，之后每次刷新直接使用
+    function getEls(){
+        if(!els){
+            els = {
+                avail: document.getElementById('statAvail'),
+                cd: document.getElementById('statCd'),
+                cdText: document.getElementById('cd-text'),
+                times: document.getElementById('statTimes'),
+                btn: document.getElementById('claimBtn'),
+                badge: document.getElementById('badge'),
+                remain: document.getElementById('remainBadge'),
+                mode: document.getElementById('modeBadge'),
+                msg: document.getElementById('cdMsg'),
+                hist: document.getElementById('hist'),
+                histRows: buildHistRows(document.getElementById('histTpl').content.firstElementChild)
+            };
+        }
+        return els;
+    }
+
+    // 自动充值/返回兑换码两种行各预先裁好一份，循环里只需克隆和填值
+    function buildHistRows(tpl){
+        var auto = tpl.cloneNode(true), manual = tpl.cloneNode(true);
+        auto.querySelector('.h-code').remove();
+        auto.querySelector('.h-manual').remove();
+        manual.querySelector('.h-auto').remove();
+        return {auto: auto, manual: manual};
     }
 
     function updateUI(d){
-        document.getElementById('statAvail').textContent=d.available_count;
-        document.getElementById('statCd').textContent=document.getElementById('cd-text').textContent;
-        document.getElementById('statTimes').textContent=d.claim_times+'次';
-        
-        var btn=document.getElementById('claimBtn');
-        var badge=document.getElementById('badge');
-        var remainBadge=document.getElementById('remainBadge');
-        var modeBadge=document.getElementById('modeBadge');
-        var msg=document.getElementById('cdMsg');
+        var e = getEls();
+        e.avail.textContent=d.available_count;
+        e.cd.textContent=e.cdText.textContent;
+        e.times.textContent=d.claim_times+'次';
         
-        remainBadge.textContent='剩余 '+d.remaining_claims+'/'+d.claim_times+' 次';
+        e.remain.textContent='剩余 '+d.remaining_claims+'/'+d.claim_times+' 次';
         
         if(d.claim_mode === 'B'){
-            modeBadge.textContent='🔄 自动充值';
-            modeBadge.className='badge bg-green-900/50 text-green-400 border border-green-600';
+            e.mode.textContent='🔄 自动充值';
+            e.mode.className='badge bg-green-900/50 text-green-400 border border-green-600';
         }else{
-            modeBadge.textContent='📝 返回兑换码';
-            modeBadge.className='badge bg-blue-900/50 text-blue-400 border border-blue-600';
+            e.mode.textContent='📝 返回兑换码';
+            e.mode.className='badge bg-blue-900/50 text-blue-400 border border-blue-600';
         }
         
         if(d.can_claim){
-            btn.disabled=false;
-            badge.textContent='✅ 可领取';
-            badge.className='badge bg-green-900/50 text-green-400 border border-green-600';
-            msg.textContent='';
+            e.btn.disabled=false;
+            e.badge.textContent='✅ 可领取';
+            e.badge.className='badge bg-green-900/50 text-green-400 border border-green-600';
+            e.msg.textContent='';
         }else{
-            btn.disabled=true;
-            badge.textContent='⏳ 冷却中';
-            badge.className='badge bg-yellow-900/50 text-yellow-400 border border-yellow-600';
-            msg.textContent=d.cooldown_text||'';
+            e.btn.disabled=true;
+            e.badge.textContent='⏳ 冷却中';
+            e.badge.className='badge bg-yellow-900/50 text-yellow-400 border border-yellow-600';
+            e.msg.textContent=d.cooldown_text||'';
         }
         
-        var h=document.getElementById('hist');
         if(!d.history||d.history.length===0){
-            h.innerHTML='<p class="text-gray-500 text-center py-8">暂无领取记录</p>';
+            e.hist.innerHTML='<p class="text-gray-500 text-center py-8">暂无领取记录</p>';
         }else{
-            var html='';
-            d.history.forEach(r=>{
-                var statusHtml = r.auto_redeemed 
-                    ? '<span class="text-green-400 text-xs bg-green-900/30 px-2 py-1 rounded">✅ 已充值</span>'
-                    : '<span class="text-blue-400 text-xs bg-blue-900/30 px-2 py-1 rounded">📝 兑换码</span>';
-                html+='<div class="record-item">';
-                html+='<div class="flex justify-between items-center">';
-                html+='<div class="flex-1">';
-                if(!r.auto_redeemed){
-                    html+='<div class="font-mono text-sm text-gray-300 truncate mb-1">'+r.coupon_code+'</div>';
-                }
-                html+='<div class="text-xs text-gray-500">'+new Date(r.claim_time).toLocaleString('zh-CN')+'</div>';
-                html+='</div>';
-                html+='<div class="flex items-center gap-3">';
-                html+='<span class="text-xl font-bold text-green-400">$'+r.quota+'</span>';
-                html+=statusHtml;
-                html+='</div></div></div>';
-            });
-            h.innerHTML=html;
+            // 克隆模板节点并用 textContent 填值，不经过 HTML 解析，兑换码等内容也不会被当作标签
+            var frag=document.createDocumentFragment();
+            for(var i=0;i<d.history.length;i++){
+                var r=d.history[i];
+                var n=(r.auto_redeemed?e.histRows.auto:e.histRows.manual).cloneNode(true);
+                if(!r.auto_redeemed) n.querySelector('.h-code').textContent=r.coupon_code;
+                n.querySelector('.h-time').textContent=dateFmt.format(new Date(r.claim_time));
+                n.querySelector('.h-quota').textContent='$'+r.quota;
+                frag.appendChild(n);
+            }
+            e.hist.replaceChildren(frag);
         }
     }
 
@@ -1606,11 +2488,7 @@ CLAIM_PAGE = '''<!DOCTYPE html>
         btn.innerHTML='<span class="ld"></span> 抽取中...';
         document.getElementById('prizeBox').style.display='none';
         
-        fetch('/api/claim',{
-            method:'POST',
-            credentials:'include',
-            headers:{'Content-Type':'application/json'}
-        })
+        fetch('/api/claim',{method:'POST',credentials:'include'})
         .then(r=>{
             if(r.status===401){
                 showLogin();
@@ -1640,16 +2518,23 @@ CLAIM_PAGE = '''<!DOCTYPE html>
                     navigator.clipboard.writeText(d.coupon_code).catch(()=>{});
                     toast('恭喜获得 $'+d.quota+'！兑换码已复制',true);
                 }
+                if(d.status){
+                    updateUI(d.status);
+                    renderBigPrizes(d.status.big_prizes, 'bigPrizeList');
+                    document.getElementById('cnt').textContent=d.status.available_count;
+                }else{
+                    loadStatusThrottled();
+                    loadPublicStatsThrottled();
+                }
             }else{
                 toast(data.detail||'领取失败',false);
+                loadStatusThrottled();
             }
-            loadStatus();
-            loadPublicStats();
         })
         .catch(()=>{
             btn.innerHTML='🎰 抽取兑换券';
             toast('网络错误',false);
-            loadStatus();
+            loadStatusThrottled();
         });
     }
 
@@ -1667,7 +2552,6 @@ ADMIN_PAGE = '''<!DOCTYPE html>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>管理后台 - {{SITE_NAME}}</title>
-    <script src="https://cdn.tailwindcss.com"></script>
     <style>
         body{background:#0a0a0f;color:#e0e0e0;font-family:system-ui,sans-serif}
         .card{background:#12121a;border:1px solid #1f1f2e;border-radius:12px}
@@ -1693,7 +2577,10 @@ ADMIN_PAGE = '''<!DOCTYPE html>
         .switch.on::after{left:22px}
         .prob-bar{height:6px;background:#1f1f2e;border-radius:3px;overflow:hidden}
         .prob-fill{height:100%;background:linear-gradient(90deg,#3b82f6,#10b981);border-radius:3px}
+        /* 最近领取列表滚动区外的行跳过布局和绘制，按两行文字的高度占位 */
+        #recentBox>div{content-visibility:auto;contain-intrinsic-size:auto 48px}
     </style>
+    <link rel="stylesheet" href="/static/app.css?v={{APP_CSS_VERSION}}">
 </head>
 <body class="min-h-screen">
     <div id="overlay">
@@ -1730,8 +2617,8 @@ ADMIN_PAGE = '''<!DOCTYPE html>
         <main class="max-w-6xl mx-auto px-4 pb-8">
             <div id="tab-overview" class="tab-content">
                 <div class="grid lg:grid-cols-3 gap-4">
-                    <div class="lg:col-span-2"><div class="card p-5"><h2 class="font-semibold mb-4 text-sm">📊 统计数据</h2><div id="statsBox">加载中...</div></div></div>
-                    <div><div class="card p-5"><h2 class="font-semibold mb-4 text-sm">📋 最近领取</h2><div id="recentBox" class="max-h-80 overflow-y-auto space-y-2 text-xs"></div></div></div>
+                    <div class="lg:col-span-2"><div class="card p-5"><h2 class="font-semibold mb-4 text-sm">📊 统计数据</h2><div id="statsBox">加载中...</div><template id="statsTpl"><div class="grid grid-cols-3 gap-3 mb-4"><div class="bg-gray-800 p-3 rounded-lg text-center"><div class="s-total text-xl font-bold"></div><div class="text-gray-500 text-xs">本地总数</div></div><div class="bg-green-900/30 p-3 rounded-lg text-center border border-green-800"><div class="s-stock text-xl font-bold text-green-400"></div><div class="text-gray-500 text-xs">可抽库存</div></div><div class="bg-blue-900/30 p-3 rounded-lg text-center border border-blue-800"><div class="s-claimed text-xl font-bold text-blue-400"></div><div class="text-gray-500 text-xs">已领取</div></div></div><div class="s-prob mb-3"><h3 class="text-xs font-semibold text-gray-400 mb-2">📊 概率分布</h3><div class="s-grid grid grid-cols-2 sm:grid-cols-3 md:grid-cols-5 gap-2"></div></div></template><template id="probTpl"><div class="border rounded p-2 text-center text-xs"><span class="p-quota font-bold"></span><br><span class="p-info"></span></div></template></div></div>
+                    <div><div class="card p-5"><h2 class="font-semibold mb-4 text-sm">📋 最近领取</h2><div id="recentBox" class="max-h-80 overflow-y-auto space-y-2 text-xs"></div><template id="recentTpl"><div class="bg-gray-800/50 p-2 rounded text-gray-400"><span class="r-id text-blue-400"></span> <span class="r-name"></span> <span class="r-quota text-green-400"></span> <span class="r-auto text-green-400">[自动]</span><br><span class="r-time text-gray-600"></span></div></template></div></div>
                 </div>
             </div>
 
@@ -1778,7 +2665,7 @@ ADMIN_PAGE = '''<!DOCTYPE html>
                     </div>
                     <div class="flex items-center gap-2 mb-4">
                         <span class="text-gray-400 text-sm">额度:</span>
-                        <input type="number" id="quotaVal" value="1" step="0.01" min="0.01" class="w-20 ipt text-center font-bold text-sm">
+                        <input type="number" id="quotaVal" value="1" step="0.01" min="0.01" autocomplete="off" oninput="readQuota()" class="w-20 ipt text-center font-bold text-sm">
                         <span class="text-gray-400 text-sm">美元</span>
                     </div>
                     <div class="mb-4">
@@ -1861,29 +2748,63 @@ ADMIN_PAGE = '''<!DOCTYPE html>
     <div id="toast"></div>
 
     <script>
-    var adminPwd='';var currentWeights={};var currentStock={};var selectedCoupons=new Set();var currentPage=1;var currentMode='A';var currentProbMode='weight_stock';
+    var inflight={};
+    function coalesced(key,fn){if(inflight[key])return inflight[key];var p=fn().finally(()=>{delete inflight[key];});inflight[key]=p;return p;}
+    function debounce(fn,ms){var t;return function(){var a=arguments,c=this;clearTimeout(t);t=setTimeout(()=>fn.apply(c,a),ms);};}
+    var loadStatsDebounced=debounce(()=>loadStats(),300);
+    var adminPwd='';var pwdQuery='';var currentWeights={};var currentStock={};var selectedCoupons=new Set();var currentPage=1;var currentMode='A';var currentProbMode='weight_stock';
+    // 脚本在 body 末尾，节点都已存在；上传和统计刷新反复用到的节点在这里查一次
+    var els={
+        codes:document.getElementById('codesText'),
+        quota:document.getElementById('quotaVal'),
+        txt:document.getElementById('txtFile'),
+        stats:document.getElementById('statsBox'),
+        recent:document.getElementById('recentBox'),
+        tokenStatus:document.getElementById('tokenStatus'),
+        recentTpl:document.getElementById('recentTpl').content.firstElementChild,
+        probTpl:document.getElementById('probTpl').content.firstElementChild
+    };
 
     (function(){
         var saved=sessionStorage.getItem('admin_pwd');
-        if(saved){adminPwd=saved;verifyAndShow();}
+        if(saved){setAdminPwd(saved);verifyAndShow();}
         document.getElementById('loginPwd').addEventListener('keydown',e=>{if(e.key==='Enter')doLogin();});
     })();
 
-    function toast(msg,ok){var t=document.getElementById('toast');t.textContent=msg;t.style.display='block';t.style.background=ok?'#10b981':'#ef4444';setTimeout(()=>t.style.display='none',3000);}
+    function postJSON(url,body){return fetch(url,{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(body)}).then(readJSON);}
+    function readJSON(r){return r.json().catch(()=>({success:false,detail:'请求失败 ('+r.status+')'}));}
+    // 管理操作统一提示结果：成功时是 message，失败时是 FastAPI 的 detail
+    function notify(d){toast(d.message||d.detail,d.success);return d;}
+    function api(url,body){return postJSON(url,body).then(notify);}
+
+    // 密码只在变化时编码一次，之后的查询直接拼接
+    function setAdminPwd(pwd){adminPwd=pwd;pwdQuery='password='+encodeURIComponent(pwd);}
+
+    // 提示节点只查找一次；连续提示时清掉上一次的计时，避免新提示被旧计时提前隐藏
+    var toastEl=null,toastTimer=0;
+    function toast(msg,ok){toastEl=toastEl||document.getElementById('toast');toastEl.textContent=msg;toastEl.style.display='block';toastEl.style.background=ok?'#10b981':'#ef4444';clearTimeout(toastTimer);toastTimer=setTimeout(()=>toastEl.style.display='none',3000);}
 
     function doLogin(){
         var pwd=document.getElementById('loginPwd').value;
         if(!pwd){document.getElementById('loginError').textContent='请输入密码';document.getElementById('loginError').style.display='block';return;}
         fetch('/api/admin/login',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:pwd})})
-        .then(r=>{if(r.ok){adminPwd=pwd;sessionStorage.setItem('admin_pwd',pwd);document.getElementById('overlay').style.display='none';document.getElementById('adminMain').style.display='block';loadStats();}else{document.getElementById('loginError').textContent='密码错误';document.getElementById('loginError').style.display='block';}});
+        .then(r=>{if(r.ok){setAdminPwd(pwd);sessionStorage.setItem('admin_pwd',pwd);showMain(true);loadStats();}else{document.getElementById('loginError').textContent='密码错误';document.getElementById('loginError').style.display='block';}});
     }
 
+    function showMain(show){document.getElementById('overlay').style.display=show?'none':'';document.getElementById('adminMain').style.display=show?'block':'none';if(show)subscribeStats();else if(statsEvents){statsEvents.close();statsEvents=null;}}
+
     function verifyAndShow(){
-        fetch('/api/admin/stats?password='+encodeURIComponent(adminPwd))
-        .then(r=>{if(r.ok){document.getElementById('overlay').style.display='none';document.getElementById('adminMain').style.display='block';loadStats();}else{sessionStorage.removeItem('admin_pwd');adminPwd='';}});
+        var cached=sessionStorage.getItem('stats_cache');
+        var ts=parseInt(sessionStorage.getItem('stats_cache_ts'))||0;
+        if(cached&&Date.now()-ts<15000){showMain(true);renderStats(parseStats(cached).data);}
+        // 验证密码的这次请求本身就是统计数据，直接用来渲染，不再额外请求一次
+        coalesced('stats',()=>fetchStats().then(r=>{
+            if(r.ok){showMain(true);applyStats(r.txt);}
+            else{sessionStorage.removeItem('admin_pwd');sessionStorage.removeItem('stats_cache');setAdminPwd('');showMain(false);}
+        }));
     }
 
-    function doLogout(){sessionStorage.removeItem('admin_pwd');adminPwd='';location.reload();}
+    function doLogout(){sessionStorage.removeItem('admin_pwd');sessionStorage.removeItem('stats_cache');setAdminPwd('');location.reload();}
 
     function switchTab(tab){
         document.querySelectorAll('.tab-content').forEach(el=>el.style.display='none');
@@ -1891,94 +2812,95 @@ ADMIN_PAGE = '''<!DOCTYPE html>
         document.getElementById('tab-'+tab).style.display='block';
         event.target.classList.add('active');
         if(tab==='coupons')loadCoupons(1);
-        if(tab==='overview')loadStats();
+        if(tab==='overview')loadStatsDebounced();
     }
 
-    function setQuota(q){document.getElementById('quotaVal').value=q;}
+    // 额度在输入变化时校验一次并缓存成数字，上传时直接使用；无效时为 0
+    // 初始值从输入框读取，不假定为 1：浏览器刷新或前进后退时可能恢复了之前填的额度
+    var quotaNum=0;
+    function readQuota(){
+        var v=+els.quota.value;
+        quotaNum=v>0&&isFinite(v)?v:0;
+    }
+    readQuota();
+    // 从往返缓存恢复的页面不会重新执行脚本，再同步一次
+    window.addEventListener('pageshow',readQuota);
+    function setQuota(q){els.quota.value=q;quotaNum=q;}
+
+    // 兑换码以纯文本作为请求体发送，服务端边接收边按行入库，不需要 multipart 编码或 JSON 数组
+    function uploadCodes(body,q){
+        if(!q){toast('额度必须大于0',false);return Promise.resolve({});}
+        return fetch('/api/admin/upload-txt',{method:'POST',body:body,headers:{'Content-Type':'text/plain; charset=utf-8','X-Admin-Password':encodeURIComponent(adminPwd),'X-Quota':String(q)}}).then(readJSON).then(notify);
+    }
 
     function doUpload(){
-        var q=document.getElementById('quotaVal').value;
-        var f=document.getElementById('txtFile').files[0];
+        var q=quotaNum;
+        var f=els.txt.files[0];
         if(!f){toast('请选择文件',false);return;}
-        var fd=new FormData();fd.append('password',adminPwd);fd.append('quota',q);fd.append('file',f);
-        fetch('/api/admin/upload-txt',{method:'POST',body:fd}).then(r=>r.json()).then(d=>{toast(d.message||d.detail,d.success);if(d.success){loadStats();document.getElementById('txtFile').value='';}});
+        // 直接把文件作为请求体，浏览器从磁盘流式读取
+        uploadCodes(f,q).then(d=>{if(d.success){scheduleStats();els.txt.value='';}});
     }
 
     function doAddCodes(){
-        var q=parseFloat(document.getElementById('quotaVal').value);
-        var txt=document.getElementById('codesText').value;
-        var arr=txt.split('\\n').filter(s=>s.trim());
-        if(!arr.length){toast('请输入兑换码',false);return;}
-        fetch('/api/admin/add-coupons',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:adminPwd,quota:q,coupons:arr})})
-        .then(r=>r.json()).then(d=>{toast(d.message||d.detail,d.success);if(d.success){loadStats();document.getElementById('codesText').value='';}});
+        var q=quotaNum;
+        var txt=els.codes.value;
+        if(!/\\S/.test(txt)){toast('请输入兑换码',false);return;}
+        // 粘贴的内容原样发送，页面不再拆分成数组，也不生成一个超大的 JSON
+        uploadCodes(new Blob([txt]),q).then(d=>{if(d.success){scheduleStats();els.codes.value='';}});
     }
 
     function loadCoupons(page){
         currentPage=page;selectedCoupons.clear();
         var status=document.getElementById('couponStatus').value;
         var search=document.getElementById('couponSearch').value;
-        fetch('/api/admin/coupons?password='+encodeURIComponent(adminPwd)+'&page='+page+'&status='+status+'&search='+encodeURIComponent(search))
+        fetch('/api/admin/coupons?'+pwdQuery+'&page='+page+'&status='+status+'&search='+encodeURIComponent(search))
         .then(r=>r.json()).then(res=>{if(res.success)renderCoupons(res.data);});
     }
 
+    // 兑换码、用户名来自外部，拼进 HTML 前查表转义，不会被当成标签或实体解析
+    var ESC={'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'};
+    function esc(s){return String(s).replace(/[&<>"']/g,ch=>ESC[ch]);}
+
     function renderCoupons(data){
-        var html='';
-        data.coupons.forEach(function(c){
-            var statusClass=c.is_claimed?'text-gray-500':'text-green-400';
-            var statusText=c.is_claimed?'已领':'可用';
-            html+='<div class="coupon-row">';
-            html+='<div class="flex items-center gap-1 min-w-0"><input type="checkbox" data-id="'+c.id+'" onchange="toggleSelect('+c.id+')"><span class="font-mono truncate">'+c.code+'</span></div>';
-            html+='<div class="text-blue-400 font-bold">$'+c.quota+'</div>';
-            html+='<div class="'+statusClass+'">'+statusText+'</div>';
-            html+='<div class="text-gray-500 truncate">'+(c.claimed_by||'-')+'</div>';
-            html+='<div><button class="text-red-400 hover:text-red-300" onclick="deleteCoupon('+c.id+')">删</button></div>';
-            html+='</div>';
-        });
+        // 每行一个模板字符串，最后一次 join，不再逐段 += 拼接
+        var html=data.coupons.map(c=>`<div class="coupon-row"><div class="flex items-center gap-1 min-w-0"><input type="checkbox" data-id="${c.id}" onchange="toggleSelect(${c.id})"><span class="font-mono truncate">${esc(c.code)}</span></div><div class="text-blue-400 font-bold">$${c.quota}</div><div class="${c.is_claimed?'text-gray-500':'text-green-400'}">${c.is_claimed?'已领':'可用'}</div><div class="text-gray-500 truncate">${esc(c.claimed_by||'-')}</div><div><button class="text-red-400 hover:text-red-300" onclick="deleteCoupon(${c.id})">删</button></div></div>`).join('');
         document.getElementById('couponList').innerHTML=html||'<p class="text-gray-500 text-center py-4 text-sm">暂无数据</p>';
-        var phtml='';for(var i=1;i<=data.pages;i++){phtml+='<button class="px-2 py-1 rounded text-xs '+(i===data.page?'bg-blue-600':'bg-gray-700')+'" onclick="loadCoupons('+i+')">'+i+'</button>';}
-        document.getElementById('pagination').innerHTML=phtml;
+        var pages=[];for(var i=1;i<=data.pages;i++){pages.push(`<button class="px-2 py-1 rounded text-xs ${i===data.page?'bg-blue-600':'bg-gray-700'}" onclick="loadCoupons(${i})">${i}</button>`);}
+        document.getElementById('pagination').innerHTML=pages.join('');
     }
 
     function toggleSelect(id){if(selectedCoupons.has(id))selectedCoupons.delete(id);else selectedCoupons.add(id);}
     function toggleSelectAll(){var checked=document.getElementById('selectAllCheck').checked;document.querySelectorAll('#couponList input[type=checkbox]').forEach(cb=>{cb.checked=checked;var id=parseInt(cb.dataset.id);if(checked)selectedCoupons.add(id);else selectedCoupons.delete(id);});}
     function selectAllCoupons(){document.getElementById('selectAllCheck').checked=true;toggleSelectAll();}
 
-    function deleteCoupon(id){if(!confirm('确定删除？'))return;fetch('/api/admin/delete-coupon',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:adminPwd,id:id})}).then(r=>r.json()).then(d=>{toast(d.message,d.success);if(d.success)loadCoupons(currentPage);});}
+    function deleteCoupon(id){if(!confirm('确定删除？'))return;api('/api/admin/delete-coupon',{password:adminPwd,id:id}).then(d=>{if(d.success)loadCoupons(currentPage);});}
 
-    function deleteSelected(){if(selectedCoupons.size===0){toast('请先选择',false);return;}if(!confirm('确定删除选中的 '+selectedCoupons.size+' 个？'))return;fetch('/api/admin/delete-coupons-batch',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:adminPwd,ids:Array.from(selectedCoupons),type:'selected'})}).then(r=>r.json()).then(d=>{toast(d.message,d.success);if(d.success)loadCoupons(currentPage);});}
+    function deleteSelected(){if(selectedCoupons.size===0){toast('请先选择',false);return;}if(!confirm('确定删除选中的 '+selectedCoupons.size+' 个？'))return;api('/api/admin/delete-coupons-batch',{password:adminPwd,ids:Array.from(selectedCoupons),type:'selected'}).then(d=>{if(d.success)loadCoupons(currentPage);});}
 
-    function deleteBatch(type){if(!confirm('确定删除？'))return;fetch('/api/admin/delete-coupons-batch',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:adminPwd,type:type})}).then(r=>r.json()).then(d=>{toast(d.message,d.success);if(d.success)loadCoupons(1);});}
+    function deleteBatch(type){if(!confirm('确定删除？'))return;api('/api/admin/delete-coupons-batch',{password:adminPwd,type:type}).then(d=>{if(d.success)loadCoupons(1);});}
 
     function renderWeightsAndStock(weights, stock, probInfo){
-        currentWeights={};currentStock={};
-        for(var k in weights)currentWeights[k]=weights[k];
-        for(var k in stock)currentStock[k]=stock[k];
+        currentWeights=Object.assign({},weights);currentStock=Object.assign({},stock);
         
         var probMap = {};
         if(probInfo){probInfo.forEach(function(p){ probMap[p.quota] = p.probability; });}
         
-        var allKeys = new Set([...Object.keys(currentWeights), ...Object.keys(currentStock)]);
-        var sortedKeys = Array.from(allKeys).sort((a,b)=>parseFloat(a)-parseFloat(b));
+        // 两份配置合并后取自有键，按额度数值排序，渲染顺序固定
+        var sortedKeys = Object.keys(Object.assign({}, currentWeights, currentStock)).sort((a,b)=>a-b);
         
-        var html='';
-        sortedKeys.forEach(function(k){
+        var html=sortedKeys.map(function(k){
             var weight = currentWeights[k] || 0;
             var stockVal = currentStock[k] || 0;
             var prob = probMap[k] || 0;
             var isBigPrize = parseFloat(k) >= 50;
             var rowClass = isBigPrize ? 'border-l-4 border-yellow-500' : '';
             var stockClass = stockVal <= 0 ? 'border-red-500 bg-red-900/20' : '';
-            
-            html+='<div class="weight-row '+rowClass+'">';
-            html+='<div class="flex items-center gap-1 w-16">';
-            if(isBigPrize) html+='<span class="text-yellow-400 text-xs">🏆</span>';
-            html+='<span class="text-blue-400 font-bold text-sm">$'+k+'</span></div>';
-            html+='<input type="number" step="0.01" min="0" value="'+weight+'" onchange="updateWeight(\\''+k+'\\', this.value)" class="w-14 ipt text-center text-xs p-1" title="权重">';
-            html+='<input type="number" min="0" value="'+stockVal+'" onchange="updateStock(\\''+k+'\\', this.value)" class="w-14 ipt text-center text-xs p-1 '+stockClass+'" title="库存">';
-            html+='<div class="flex-1 min-w-20"><div class="prob-bar"><div class="prob-fill" style="width:'+Math.min(prob,100)+'%"></div></div><span class="text-xs text-gray-400">'+prob.toFixed(1)+'%</span></div>';
-            html+='<button onclick="removeQuota(\\''+k+'\\')" class="text-red-400 text-sm">✕</button>';
-            html+='</div>';
-        });
+            return `<div class="weight-row ${rowClass}"><div class="flex items-center gap-1 w-16">${isBigPrize?'<span class="text-yellow-400 text-xs">🏆</span>':''}<span class="text-blue-400 font-bold text-sm">$${k}</span></div>`
+                +`<input type="number" step="0.01" min="0" value="${weight}" onchange="updateWeight('${k}', this.value)" class="w-14 ipt text-center text-xs p-1" title="权重">`
+                +`<input type="number" min="0" value="${stockVal}" onchange="updateStock('${k}', this.value)" class="w-14 ipt text-center text-xs p-1 ${stockClass}" title="库存">`
+                +`<div class="flex-1 min-w-20"><div class="prob-bar"><div class="prob-fill" style="width:${Math.min(prob,100)}%"></div></div><span class="text-xs text-gray-400">${prob.toFixed(1)}%</span></div>`
+                +`<button onclick="removeQuota('${k}')" class="text-red-400 text-sm">✕</button></div>`;
+        }).join('');
         document.getElementById('weightsContainer').innerHTML=html||'<p class="text-gray-500 text-sm">暂无配置</p>';
     }
 
@@ -2002,15 +2924,13 @@ ADMIN_PAGE = '''<!DOCTYPE html>
     function toggleMode(){
         currentMode=currentMode==='A'?'B':'A';
         updateModeUI();
-        fetch('/api/admin/update-config',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:adminPwd,claim_mode:currentMode})})
-        .then(r=>r.json()).then(d=>{toast(d.message,d.success);loadStats();});
+        api('/api/admin/update-config',{password:adminPwd,claim_mode:currentMode}).then(()=>loadStatsDebounced());
     }
 
     function toggleProbMode(){
         currentProbMode=currentProbMode==='weight_only'?'weight_stock':'weight_only';
         updateProbModeUI();
-        fetch('/api/admin/update-config',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:adminPwd,probability_mode:currentProbMode})})
-        .then(r=>r.json()).then(d=>{toast(d.message,d.success);loadStats();});
+        api('/api/admin/update-config',{password:adminPwd,probability_mode:currentProbMode}).then(()=>loadStatsDebounced());
     }
 
     function updateModeUI(){
@@ -2037,16 +2957,105 @@ ADMIN_PAGE = '''<!DOCTYPE html>
         var minutes=parseInt(document.getElementById('cooldownMinutes').value);
         var times=parseInt(document.getElementById('claimTimes').value);
         var rate=parseInt(document.getElementById('quotaRate').value);
-        fetch('/api/admin/update-config',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:adminPwd,cooldown_minutes:minutes,claim_times:times,quota_rate:rate})}).then(r=>r.json()).then(d=>toast(d.message,d.success));
+        api('/api/admin/update-config',{password:adminPwd,cooldown_minutes:minutes,claim_times:times,quota_rate:rate});
     }
 
     function saveWeightsAndStock(){
-        fetch('/api/admin/update-config',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({password:adminPwd,quota_weights:currentWeights,quota_stock:currentStock})}).then(r=>r.json()).then(d=>{toast(d.message,d.success);if(d.success)loadStats();});
+        api('/api/admin/update-config',{password:adminPwd,quota_weights:currentWeights,quota_stock:currentStock}).then(d=>{if(d.success)scheduleStats();});
+    }
+
+    // 记住上次完整响应的 ETag 和文本，服务端返回 304 时直接复用这份文本
+    var statsEtag=null,statsEtagTxt=null;
+    function fetchStats(signal){
+        return fetch('/api/admin/stats?'+pwdQuery,{signal:signal,headers:statsEtag?{'If-None-Match':statsEtag}:{}}).then(r=>{
+            if(r.status===304)return {ok:true,txt:statsEtagTxt};
+            return r.text().then(txt=>{
+                if(r.ok){statsEtag=r.headers.get('ETag');statsEtagTxt=txt;}
+                return {ok:r.ok,txt:txt};
+            });
+        });
     }
 
+    // 原始响应文本存进 sessionStorage，刷新页面时先渲染缓存再后台更新
+    // 与上次文本相同时复用已解析的对象；推送的内容没变化时整个跳过
+    var lastStatsTxt=null,lastStats=null;
+    function parseStats(txt){
+        if(txt!==lastStatsTxt){lastStats=JSON.parse(txt);lastStatsTxt=txt;}
+        return lastStats;
+    }
+
+    function applyStats(txt,live){
+        if(live&&txt===lastStatsTxt)return;
+        var res=parseStats(txt);
+        if(!res.success)return;
+        renderStats(res.data,live);
+        persistStats(txt);
+    }
+
+    // 写 sessionStorage 会阻塞主线程，放到空闲时执行；连续多次只写最后一份
+    var pendingStats=null,statsTimer=null;
+    function persistStats(txt){
+        pendingStats=txt;
+        if(statsTimer)return;
+        var idle=window.requestIdleCallback||function(cb){return setTimeout(cb,0);};
+        statsTimer=idle(function(){
+            statsTimer=null;
+            try{sessionStorage.setItem('stats_cache',pendingStats);sessionStorage.setItem('stats_cache_ts',String(Date.now()));}catch(e){}
+        },{timeout:1000});
+    }
+
+    // 新请求发出前取消还在进行的旧请求，只解析最新的响应
+    var statsAbort=null;
     function loadStats(){
-        fetch('/api/admin/stats?password='+encodeURIComponent(adminPwd)).then(r=>r.json()).then(res=>{
-            if(!res.success)return;var d=res.data;
+        if(statsAbort)statsAbort.abort();
+        var ctl=statsAbort=new AbortController();
+        return fetchStats(ctl.signal).then(r=>{if(r.ok)applyStats(r.txt);})
+        .catch(e=>{if(e.name!=='AbortError')throw e;})
+        .finally(()=>{if(statsAbort===ctl)statsAbort=null;});
+    }
+
+    // 操作完成后的刷新合并到下一帧，连续多个操作只请求一次
+    var statsPending=false;
+    function scheduleStats(){
+        if(statsPending)return;
+        statsPending=true;
+        requestAnimationFrame(()=>{statsPending=false;loadStats();});
+    }
+
+    // 登录后订阅统计推送，数据变化时服务端主动发来最新统计
+    var statsEvents=null;
+    function subscribeStats(){
+        if(statsEvents||!window.EventSource)return;
+        statsEvents=new EventSource('/api/admin/events?'+pwdQuery);
+        statsEvents.onmessage=function(e){applyStats(e.data,true);};
+        statsEvents.addEventListener('claim',function(e){prependRecent(JSON.parse(e.data));});
+    }
+
+    // 领取推送只插入这一行并更新已领取数，其余统计等下一次全量推送
+    var RECENT_MAX=50;
+    function prependRecent(c){
+        var box=els.recent;
+        if(!box.querySelector('.r-id'))box.replaceChildren();
+        box.prepend(recentRow(c.user_id,c.username,c.quota,c.time,c.auto_redeemed));
+        recentSig=null;
+        while(box.children.length>RECENT_MAX)box.lastElementChild.remove();
+        if(statsEls&&!c.auto_redeemed)statsEls.claimed.textContent=(parseInt(statsEls.claimed.textContent)||0)+1;
+    }
+
+    function recentRow(uid,name,quota,time,auto){
+        var n=els.recentTpl.cloneNode(true);
+        n.querySelector('.r-id').textContent='ID:'+uid;
+        n.querySelector('.r-name').textContent=name;
+        n.querySelector('.r-quota').textContent='$'+quota;
+        n.querySelector('.r-time').textContent=time;
+        if(!auto)n.querySelector('.r-auto').remove();
+        return n;
+    }
+
+    // live 为 true 时是服务端推送，只刷新统计展示，不覆盖管理员可能正在编辑的配置表单
+    var statsEls=null,probSig=null,recentSig=null;
+    function renderStats(d,live){
+        if(!live){
             document.getElementById('cooldownMinutes').value=d.cooldown_minutes;
             document.getElementById('claimTimes').value=d.claim_times;
             document.getElementById('quotaRate').value=d.quota_rate;
@@ -2055,41 +3064,95 @@ ADMIN_PAGE = '''<!DOCTYPE html>
             updateModeUI();
             updateProbModeUI();
             renderWeightsAndStock(d.quota_weights, d.quota_stock, d.probability_info);
-            
-            var tokenStatus=document.getElementById('tokenStatus');
-            tokenStatus.textContent=d.admin_token_configured?'✅ 管理员令牌已配置':'❌ 未配置管理员令牌';
-            tokenStatus.className='text-xs '+(d.admin_token_configured?'text-green-400':'text-red-400');
-            
-            var h='<div class="grid grid-cols-3 gap-3 mb-4">';
-            h+='<div class="bg-gray-800 p-3 rounded-lg text-center"><div class="text-xl font-bold">'+d.total+'</div><div class="text-gray-500 text-xs">本地总数</div></div>';
-            h+='<div class="bg-green-900/30 p-3 rounded-lg text-center border border-green-800"><div class="text-xl font-bold text-green-400">'+d.total_virtual_stock+'</div><div class="text-gray-500 text-xs">可抽库存</div></div>';
-            h+='<div class="bg-blue-900/30 p-3 rounded-lg text-center border border-blue-800"><div class="text-xl font-bold text-blue-400">'+d.claimed+'</div><div class="text-gray-500 text-xs">已领取</div></div>';
-            h+='</div>';
-            
-            if(d.probability_info && d.probability_info.length > 0){
-                h+='<div class="mb-3"><h3 class="text-xs font-semibold text-gray-400 mb-2">📊 概率分布</h3><div class="grid grid-cols-2 sm:grid-cols-3 md:grid-cols-5 gap-2">';
-                d.probability_info.forEach(function(p){
-                    var colorClass = p.stock > 0 ? 'bg-green-900/30 border-green-800 text-green-400' : 'bg-red-900/30 border-red-800 text-red-400';
-                    h+='<div class="'+colorClass+' border rounded p-2 text-center text-xs">';
-                    h+='<span class="font-bold">$'+p.quota+'</span><br>';
-                    h+='<span>库存:'+p.stock+' | '+p.probability+'%</span></div>';
-                });
-                h+='</div></div>';
-            }
-            
-            document.getElementById('statsBox').innerHTML=h;
-            
-            var rh='';d.recent_claims.forEach(c=>{var autoTag=c.auto_redeemed?'<span class="text-green-400">[自动]</span>':'';rh+='<div class="bg-gray-800/50 p-2 rounded text-gray-400"><span class="text-blue-400">ID:'+c.user_id+'</span> '+c.username+' <span class="text-green-400">$'+c.quota+'</span> '+autoTag+'<br><span class="text-gray-600">'+c.time+'</span></div>';});
-            document.getElementById('recentBox').innerHTML=rh||'<p class="text-gray-600">暂无</p>';
+        }
+        
+        var tokenStatus=els.tokenStatus;
+        tokenStatus.textContent=d.admin_token_configured?'✅ 管理员令牌已配置':'❌ 未配置管理员令牌';
+        tokenStatus.className='text-xs '+(d.admin_token_configured?'text-green-400':'text-red-400');
+        
+        // 统计区结构只克隆一次，之后只更新数字和概率格子
+        if(!statsEls){
+            var n=document.getElementById('statsTpl').content.cloneNode(true);
+            statsEls={total:n.querySelector('.s-total'),stock:n.querySelector('.s-stock'),claimed:n.querySelector('.s-claimed'),prob:n.querySelector('.s-prob'),grid:n.querySelector('.s-grid')};
+            els.stats.replaceChildren(n);
+        }
+        statsEls.total.textContent=d.total;
+        statsEls.stock.textContent=d.total_virtual_stock;
+        statsEls.claimed.textContent=d.claimed;
+        
+        // 概率格子和最近领取列表按内容签名比较，没变化时不重建节点
+        var info=d.probability_info||[];
+        var sig=JSON.stringify(info);
+        if(sig!==probSig){probSig=sig;renderProbGrid(info);}
+        
+        // 最近领取按列下发：user_ids/usernames/quotas/times/auto_redeemed 同下标为一行
+        var rc=d.recent_claims,len=rc.user_ids.length;
+        sig=len+'|'+(len?rc.user_ids[0]+'|'+rc.times[0]:'');
+        if(sig===recentSig)return;
+        recentSig=sig;
+        var box=els.recent;
+        if(!len){box.innerHTML='<p class="text-gray-600">暂无</p>';return;}
+        var frag=document.createDocumentFragment();
+        for(var i=0;i<len;i++)frag.appendChild(recentRow(rc.user_ids[i],rc.usernames[i],rc.quotas[i],rc.times[i],rc.auto_redeemed[i]));
+        box.replaceChildren(frag);
+    }
+
+    function renderProbGrid(info){
+        statsEls.prob.hidden=!info.length;
+        var probTpl=els.probTpl;
+        var probFrag=document.createDocumentFragment();
+        info.forEach(function(p){
+            var n=probTpl.cloneNode(true);
+            n.className=(p.stock > 0 ? 'bg-green-900/30 border-green-800 text-green-400 ' : 'bg-red-900/30 border-red-800 text-red-400 ')+n.className;
+            n.querySelector('.p-quota').textContent='$'+p.quota;
+            n.querySelector('.p-info').textContent='库存:'+p.stock+' | '+p.probability+'%';
+            probFrag.appendChild(n);
         });
+        statsEls.grid.replaceChildren(probFrag);
     }
     </script>
 </body>
 </html>'''
 
+# ============ 模板预渲染 ============
+def render_static_placeholders(template: str) -> str:
+    """替换进程生命周期内不变的占位符"""
+    html = template.replace("{{SITE_NAME}}", SITE_NAME)
+    html = html.replace("{{NEW_API_URL}}", NEW_API_URL)
+    html = html.replace("{{COUPON_SITE_URL}}", COUPON_SITE_URL)
+    html = html.replace("{{APP_CSS_VERSION}}", APP_CSS_VERSION)
+    return html
+
+def compile_template(template: str) -> tuple:
+    """按 {{NAME}} 切分模板并把固定文本预先编码成字节，渲染时一次拼接，不必对整页做 replace 和编码"""
+    parts = re.split(r"\{\{(\w+)\}\}", render_static_placeholders(template))
+    return tuple(part if i % 2 else part.encode("utf-8") for i, part in enumerate(parts))
+
+HOME_PAGE_TMPL = compile_template(HOME_PAGE)
+CLAIM_PAGE_TMPL = compile_template(CLAIM_PAGE)
+ADMIN_PAGE_ENCODED = encode_page(render_static_placeholders(ADMIN_PAGE), static=True)
+# 页面源字符串（中文内容按 UCS-2 存储，合计约 250KB）编译后不再使用，释放掉以减少每个 worker 的常驻内存
+del HOME_PAGE, CLAIM_PAGE, ADMIN_PAGE
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8080")))
+    # 多 worker 需要以导入路径启动；装了 uvloop/httptools 时 auto 会自动选用
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8080")),
+        # 默认单 worker：同一用户的领取锁、冷却缓存、会话缓存和后台推送都只在进程内共享，
+        # 多个 worker 时同一用户可能在两个进程里同时领取成功，改配置、退出登录只在处理请求的进程生效，
+        # 推送也只到达连在同一进程上的后台页面。确认能接受这些限制后再用 WEB_CONCURRENCY 开启多进程
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="auto",
+        http="auto",
+        # 默认 5 秒空闲就断开，用户两次操作之间通常更久；延长后浏览器可以复用同一条连接
+        timeout_keep_alive=int(os.getenv("KEEP_ALIVE_TIMEOUT", "65")),
+        log_level=os.getenv("LOG_LEVEL", "warning"),
+        # 访问日志每个请求都要格式化一行，默认关闭，需要排查时设 ACCESS_LOG=1
+        access_log=os.getenv("ACCESS_LOG", "0") == "1"
+    )
 
 
 